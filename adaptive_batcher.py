@@ -0,0 +1,103 @@
+# adaptive_batcher.py
+
+import os
+
+# Ollama's default context window; raise MOOSE_LLM_CONTEXT if the server runs with a larger num_ctx
+DEFAULT_CONTEXT_TOKENS = int(os.environ.get("MOOSE_LLM_CONTEXT", "2048"))
+
+
+def estimate_tokens(text):
+    """
+    Roughly estimates the number of LLM tokens in a string (about four characters per token).
+
+    Parameters:
+    - text (str): The text to measure.
+
+    Returns:
+    - int: The estimated token count.
+    """
+    return len(str(text)) // 4 + 1
+
+
+class AdaptiveBatcher:
+    """
+    Chooses categorization batch sizes from a token budget and adapts them to measured throughput.
+
+    Each batch must fit the model's context window: the fixed prompt, every description once in the
+    request and once more in the 'Transaction - Category' answer. Within that budget the target size
+    hill-climbs on rows categorized per second: it keeps moving in the direction that last raised
+    throughput and turns around when throughput falls. A batch that is only partly parsed halves it.
+    """
+
+    def __init__(self, prompt_tokens, category_tokens, context_tokens=DEFAULT_CONTEXT_TOKENS,
+                 initial_size=10, min_size=1, max_size=200, safety=0.8):
+        self.budget = max(1, int(context_tokens * safety) - prompt_tokens)
+        self.category_tokens = category_tokens
+        self.size = max(min_size, initial_size)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.rows_per_second = {}  # Batch size -> smoothed rows categorized per second
+        self.direction = 1
+        self.last_size = None
+
+    def item_tokens(self, description):
+        """Tokens one description costs: once in the prompt, once echoed back with its category and numbering."""
+        return 2 * estimate_tokens(description) + self.category_tokens + 4
+
+    def take(self, items, start):
+        """
+        Picks the end index of the next batch starting at `start`.
+
+        A batch cut short by the token budget also lowers the target size to it, so the size never
+        climbs past what the context window holds.
+
+        Parameters:
+        - items (list): All descriptions waiting to be categorized.
+        - start (int): Index of the first description of the batch.
+
+        Returns:
+        - int: The exclusive end index; always at least `start + 1` while items remain.
+        """
+        end = start
+        used = 0
+        while end < len(items) and end - start < self.size:
+            cost = self.item_tokens(items[end])
+            if end > start and used + cost > self.budget:
+                self.size = max(self.min_size, end - start)
+                break
+            used += cost
+            end += 1
+        return end
+
+    def record(self, size, elapsed, parse_rate):
+        """
+        Updates the throughput measured at `size` and, for a batch of the current target size, moves the target.
+
+        Parameters:
+        - size (int): Number of descriptions sent.
+        - elapsed (float): Seconds the batch took, including retries.
+        - parse_rate (float): Fraction of the descriptions that came back with a category.
+        """
+        if parse_rate < 0.9:
+            # The model dropped or garbled part of the answer: back off and climb again from there
+            self.size = max(self.min_size, min(self.size, size) // 2)
+            self.direction = 1
+            self.last_size = None
+            return
+        if elapsed <= 0:
+            return
+        rate = parse_rate * size / elapsed
+        previous = self.rows_per_second.get(size)
+        self.rows_per_second[size] = rate if previous is None else 0.5 * previous + 0.5 * rate
+
+        # Re-queued halves, the last batch and batches sent before the target last moved only add measurements
+        if size != self.size:
+            return
+        if self.last_size is not None and self.rows_per_second[size] < self.rows_per_second[self.last_size]:
+            self.direction = -self.direction
+        self.last_size = size
+        step = max(1, size // 4)
+        self.size = min(self.max_size, max(self.min_size, size + self.direction * step))
+        if self.size == size:
+            # Pinned at a bound: try the other way next
+            self.direction = -self.direction
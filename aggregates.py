@@ -0,0 +1,339 @@
+# aggregates.py
+
+import numpy as np
+import pandas as pd
+
+from canonicalize import MerchantCodes
+from date_index import DateIndex, _group_key
+from result_cache import fingerprint, frame_memo, peek_frame, remember_frame, set_fingerprint
+from schema import months, parse_dates
+
+CUBE_LEVELS = ["Month", "Expense/Income", "Category"]
+
+
+class AggregateCube:
+    """
+    Per-cell aggregates of transaction amounts indexed by (Month, Expense/Income, Category).
+
+    Every cell holds the sum, count, min, max and sum of squares of its amounts, plus the row
+    positions of its min and max so the matching transaction can still be looked up. Missing
+    months or categories form their own cells, so totals over the cube equal totals over the rows.
+    Metrics answered from the cube cost O(cells) instead of O(rows).
+    """
+
+    def __init__(self, cells):
+        self.cells = cells
+        # Roll-ups already computed, shared by every metric that asks for the same one
+        self.rollups = {}
+
+    @classmethod
+    def from_frame(cls, df, row_offset=0, positions=None):
+        """
+        Builds the cube in a single grouped pass over `df`.
+
+        Parameters:
+        - df (DataFrame): Transaction data with 'Expense/Income' and 'Amount (EUR)' columns;
+          'Date' and 'Category' are optional.
+        - row_offset (int): Added to the recorded row positions, for rows appended to a larger frame.
+        - positions (array): Explicit row positions to record instead (one per row of `df`).
+
+        Returns:
+        - AggregateCube: The aggregates of `df`.
+        """
+        amounts = pd.to_numeric(df["Amount (EUR)"], errors="coerce").to_numpy(dtype=np.float64)
+        frame = pd.DataFrame({
+            "Month": months(df).array if "Date" in df.columns else pd.array([pd.NaT] * len(df), dtype="period[M]"),
+            "Expense/Income": df["Expense/Income"].array,
+            "Category": df["Category"].array if "Category" in df.columns else np.full(len(df), np.nan, dtype=object),
+            "amount": amounts,
+            "square": amounts ** 2,
+            "row": np.arange(row_offset, row_offset + len(df)) if positions is None else positions,
+        })
+        # Rows without an amount add nothing to any aggregate
+        frame = frame[~np.isnan(amounts)]
+        grouped = frame.groupby(CUBE_LEVELS, observed=True, dropna=False, sort=True)
+        cells = grouped.agg(
+            sum=("amount", "sum"), count=("amount", "count"), min=("amount", "min"),
+            max=("amount", "max"), sumsq=("square", "sum"),
+        )
+        # Row positions of each cell's extremes; idxmin/idxmax return the first occurrence, like on the rows
+        cells["min_row"] = frame.loc[grouped["amount"].idxmin(), "row"].to_numpy()
+        cells["max_row"] = frame.loc[grouped["amount"].idxmax(), "row"].to_numpy()
+        return cls(cells)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def merge(self, other):
+        """
+        Combines this cube with the cube of rows appended after it, in O(cells).
+
+        On equal extremes the earlier row wins, as it would in a full rebuild.
+
+        Returns:
+        - AggregateCube: The aggregates of both sets of rows.
+        """
+        index = self.cells.index.union(other.cells.index).set_names(CUBE_LEVELS)
+        old = self.cells.reindex(index)
+        new = other.cells.reindex(index)
+        cells = pd.DataFrame(index=index)
+        for field in ("sum", "count", "sumsq"):
+            cells[field] = old[field].fillna(0).to_numpy() + new[field].fillna(0).to_numpy()
+        cells["count"] = cells["count"].astype(np.int64)
+        cells["min"] = np.fmin(old["min"], new["min"])
+        cells["max"] = np.fmax(old["max"], new["max"])
+        take_new_min = old["min"].isna() | (new["min"] < old["min"])
+        take_new_max = old["max"].isna() | (new["max"] > old["max"])
+        cells["min_row"] = new["min_row"].where(take_new_min, old["min_row"]).astype(np.int64)
+        cells["max_row"] = new["max_row"].where(take_new_max, old["max_row"]).astype(np.int64)
+        cells = cells[["sum", "count", "min", "max", "sumsq", "min_row", "max_row"]]
+        return AggregateCube(cells)
+
+    def select(self, type=None, category=None):
+        """Returns the cells of one transaction type and/or category."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        if type is not None:
+            mask &= self.cells.index.get_level_values("Expense/Income") == type
+        if category is not None:
+            mask &= self.cells.index.get_level_values("Category") == category
+        return self.cells[mask]
+
+    def total(self, type=None, category=None, field="sum"):
+        """Sums one aggregate over the selected cells."""
+        return self.select(type, category)[field].sum()
+
+    def by(self, level, type=None, field="sum"):
+        """
+        Rolls the selected cells up to one or more levels, leaving out cells where any of them is missing.
+
+        Parameters:
+        - level (str or list): 'Month', 'Expense/Income' and/or 'Category'.
+        - type (str): Restrict to 'Expense' or 'Income' cells.
+        - field (str): The aggregate to sum.
+
+        Returns:
+        - Series: `field` totals indexed by `level`. The result is shared; do not modify it.
+        """
+        levels = [level] if isinstance(level, str) else list(level)
+        rollup_key = (tuple(levels), type, field)
+        if rollup_key not in self.rollups:
+            cells = self.select(type)
+            keys = [cells.index.get_level_values(name) for name in levels]
+            keep = np.logical_and.reduce([~pd.isna(key) for key in keys]) if len(cells) else np.ones(0, dtype=bool)
+            self.rollups[rollup_key] = (
+                cells.loc[keep, field].groupby([key[keep] for key in keys], observed=True, sort=True).sum()
+            )
+        return self.rollups[rollup_key]
+
+    def extreme(self, type=None, largest=True):
+        """
+        Finds the row position of the largest (or smallest) amount among the selected cells.
+
+        Returns:
+        - int: Position of the first row holding the extreme amount, or None if there are no rows.
+        """
+        cells = self.select(type)
+        if cells.empty:
+            return None
+        field = "max" if largest else "min"
+        target = cells[field].max() if largest else cells[field].min()
+        return int(cells.loc[cells[field] == target, f"{field}_row"].min())
+
+    def mean(self, type=None):
+        """Mean amount over the selected cells (NaN when there are none)."""
+        cells = self.select(type)
+        count = cells["count"].sum()
+        return cells["sum"].sum() / count if count else np.nan
+
+    def std(self, type=None):
+        """Sample standard deviation of the individual amounts over the selected cells."""
+        cells = self.select(type)
+        count = cells["count"].sum()
+        if count < 2:
+            return np.nan
+        total = cells["sum"].sum()
+        return float(np.sqrt(max(cells["sumsq"].sum() - total * total / count, 0.0) / (count - 1)))
+
+
+def get_cube(df):
+    """
+    Returns the aggregate cube of `df`, building it on first use.
+
+    The cube is memoized on the frame object, so all metrics over the same dataset share one build.
+    Out-of-core sources such as `parquet_store.ParquetTransactions` build their own.
+    """
+    if not isinstance(df, pd.DataFrame):
+        return df.aggregate_cube()
+    return frame_memo(df, "cube", lambda: AggregateCube.from_frame(df))
+
+
+class RunningBalance:
+    """
+    Cumulative sum of the amounts in date order, as plotted by `charts.cumulative_sum_line_chart`.
+
+    Rows without a date are left out and missing amounts count as zero. The arrays live in buffers
+    with spare capacity, so appending rows dated after the current end costs O(batch) amortized.
+    """
+
+    def __init__(self, dates, amounts, balance, size=None, used=None):
+        self._dates = dates
+        self._amounts = amounts
+        self._balance = balance
+        self.size = len(dates) if size is None else size
+        # Length of the buffers in use, shared by every balance viewing them; only the balance that
+        # ends there may append in place
+        self._used = [self.size] if used is None else used
+
+    @staticmethod
+    def _sorted(df):
+        dates = parse_dates(df["Date"]).to_numpy(dtype="datetime64[ns]")
+        amounts = np.nan_to_num(pd.to_numeric(df["Amount (EUR)"], errors="coerce").to_numpy(dtype=np.float64))
+        valid = ~np.isnat(dates)
+        order = np.argsort(dates[valid], kind="stable")
+        return dates[valid][order], amounts[valid][order]
+
+    @classmethod
+    def from_frame(cls, df):
+        dates, amounts = cls._sorted(df)
+        return cls(dates, amounts, np.cumsum(amounts))
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def dates(self):
+        return self._dates[:self.size]
+
+    @property
+    def balance(self):
+        return self._balance[:self.size]
+
+    def extend(self, df):
+        """
+        Adds appended rows. Rows dated at or after the current end cost O(batch) amortized; a
+        backdated row recomputes the balance from its date onwards.
+
+        Returns:
+        - RunningBalance: The balance including `df`.
+        """
+        dates, amounts = self._sorted(df)
+        if not len(dates):
+            return self
+        size, end = self.size, self.size + len(dates)
+        # Existing rows stay ahead of new rows with the same timestamp, like a stable sort of the whole frame
+        start = int(np.searchsorted(self.dates, dates[0], side="right"))
+        if start == size and self._used[0] == size and end <= len(self._dates):
+            base = self._balance[size - 1] if size else 0.0
+            self._dates[size:end] = dates
+            self._amounts[size:end] = amounts
+            self._balance[size:end] = base + np.cumsum(amounts)
+            self._used[0] = end
+            return RunningBalance(self._dates, self._amounts, self._balance, end, self._used)
+
+        capacity = max(2 * end, 1024)
+        new_dates = np.empty(capacity, dtype=self._dates.dtype)
+        new_amounts = np.empty(capacity)
+        new_balance = np.empty(capacity)
+        new_dates[:start] = self._dates[:start]
+        new_amounts[:start] = self._amounts[:start]
+        new_balance[:start] = self._balance[:start]
+        suffix_dates = np.concatenate([self._dates[start:size], dates])
+        suffix_amounts = np.concatenate([self._amounts[start:size], amounts])
+        order = np.argsort(suffix_dates, kind="stable")
+        new_dates[start:end] = suffix_dates[order]
+        new_amounts[start:end] = suffix_amounts[order]
+        new_balance[start:end] = (self._balance[start - 1] if start else 0.0) + np.cumsum(suffix_amounts[order])
+        return RunningBalance(new_dates, new_amounts, new_balance, end)
+
+
+def get_running_balance(df):
+    """Returns the running balance of `df`, building it on first use (memoized on the frame object)."""
+    return frame_memo(df, "running_balance", lambda: RunningBalance.from_frame(df))
+
+
+def extend_aggregates(previous, combined):
+    """
+    Carries the aggregates of `previous` over to `combined`, its rows followed by appended ones.
+
+    Only aggregates already built for `previous` are carried over, each updated with just the
+    appended rows: the cube in O(batch + cells), the running balance in O(batch) for rows dated
+    after the existing ones, the date index without sorting again, the merchant codes by
+    canonicalizing only unseen descriptions, and the fingerprint without rehashing the old rows. Anything not built yet is left to be built on demand.
+
+    Parameters:
+    - previous (DataFrame): The frame before the append.
+    - combined (DataFrame): `previous` with the new rows appended (same row order).
+    """
+    appended = combined.iloc[len(previous):]
+    cube = peek_frame(previous, "cube")
+    if cube is not None:
+        remember_frame(combined, "cube", cube.merge(AggregateCube.from_frame(appended, row_offset=len(previous))))
+    balance = peek_frame(previous, "running_balance")
+    if balance is not None and "Date" in combined.columns:
+        remember_frame(combined, "running_balance", balance.extend(appended))
+    date_index = peek_frame(previous, "date_index")
+    if date_index is not None:
+        remember_frame(combined, "date_index", date_index.extend(combined))
+    merchant_codes = peek_frame(previous, "merchant_codes")
+    if merchant_codes is not None:
+        remember_frame(combined, "merchant_codes", merchant_codes.extend(appended["Name / Description"]))
+    parent = peek_frame(previous, "fingerprint")
+    if parent is not None:
+        set_fingerprint(combined, (parent, "append", fingerprint(appended)))
+
+
+def _group_arrays(date_index):
+    """A date index's per-group dates, prefix sums and prefix counts, keyed by group."""
+    return {
+        _group_key(group): arrays
+        for group, *arrays in zip(date_index.groups, date_index.group_dates, date_index.group_sums, date_index.group_counts)
+    }
+
+
+def verify_aggregates(df):
+    """
+    Checks the aggregates memoized on `df` (possibly maintained incrementally) against a full
+    rebuild from its rows.
+
+    Returns:
+    - list: Names of the aggregates that differ; empty when everything matches.
+    """
+    mismatches = []
+    cube = peek_frame(df, "cube")
+    if cube is not None:
+        expected = AggregateCube.from_frame(df).cells
+        actual = cube.cells.reindex(expected.index)
+        if len(cube.cells) != len(expected) or not (
+            np.allclose(actual[["sum", "sumsq", "min", "max"]], expected[["sum", "sumsq", "min", "max"]], equal_nan=True)
+            and (actual[["count", "min_row", "max_row"]].to_numpy() == expected[["count", "min_row", "max_row"]].to_numpy()).all()
+        ):
+            mismatches.append("cube")
+    balance = peek_frame(df, "running_balance")
+    if balance is not None:
+        expected = RunningBalance.from_frame(df)
+        if not (np.array_equal(balance.dates, expected.dates) and np.allclose(balance.balance, expected.balance)):
+            mismatches.append("running_balance")
+    date_index = peek_frame(df, "date_index")
+    if date_index is not None:
+        expected = DateIndex(df)
+        actual, rebuilt = _group_arrays(date_index), _group_arrays(expected)
+        if not (
+            np.array_equal(date_index.order, expected.order) and np.array_equal(date_index.dates, expected.dates)
+            and actual.keys() == rebuilt.keys()
+            and all(
+                np.array_equal(actual[key][0], dates) and np.allclose(actual[key][1], sums)
+                and np.array_equal(actual[key][2], counts)
+                for key, (dates, sums, counts) in rebuilt.items()
+            )
+        ):
+            mismatches.append("date_index")
+    merchant_codes = peek_frame(df, "merchant_codes")
+    if merchant_codes is not None:
+        expected = MerchantCodes(df["Name / Description"])
+        if not (
+            np.array_equal(merchant_codes.raw_codes, expected.raw_codes)
+            and np.array_equal(merchant_codes.merchant_of_raw, expected.merchant_of_raw)
+            and merchant_codes.raw_names.equals(expected.raw_names) and merchant_codes.merchants.equals(expected.merchants)
+        ):
+            mismatches.append("merchant_codes")
+    return mismatches
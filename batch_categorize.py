@@ -0,0 +1,214 @@
+# batch_categorize.py
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import categorization
+from canonicalize import DescriptionIndex
+from model import initialize_llm
+from schema import REQUIRED_COLUMNS
+from utils import validate_columns
+
+DEFAULT_CHECKPOINT_DIR = ".categorization_checkpoints"
+DEFAULT_SHARD_SIZE = 500
+
+# Columns a previous run leaves in its output; they are replaced rather than merged again
+RESULT_COLUMNS = ["Transaction", "Category"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Categorize a transaction CSV in resumable shards spread over processes and Ollama servers."
+    )
+    parser.add_argument("input", nargs="?", default="transactions.csv", help="CSV file to categorize")
+    parser.add_argument("output", nargs="?", default="categorized_transactions.csv", help="Where to write the result")
+    parser.add_argument("--categories", default=None,
+                        help="Comma-separated category list (default: the built-in general categories)")
+    parser.add_argument("--endpoints", default="",
+                        help="Comma-separated Ollama base URLs, e.g. http://gpu1:11434,http://gpu2:11434")
+    parser.add_argument("--models", default="llama3.2", help="Comma-separated model names")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="Worker processes (default: one per endpoint/model target, at most one per CPU); "
+                             "up to processes x workers requests are in flight in total")
+    parser.add_argument("--workers", type=int, default=categorization.DEFAULT_MAX_WORKERS,
+                        help="Concurrent LLM requests per process")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE, help="Descriptions per shard")
+    parser.add_argument("--batch-size", type=int, default=10, help="Initial LLM batch size")
+    parser.add_argument("--checkpoint-dir", default=DEFAULT_CHECKPOINT_DIR, help="Where finished batches are recorded")
+    parser.add_argument("--restart", action="store_true", help="Discard existing checkpoints and start over")
+    return parser.parse_args(argv)
+
+
+def build_targets(endpoints, models):
+    """
+    Lists every (endpoint, model) pair shards can be sent to.
+
+    Parameters:
+    - endpoints (list): Ollama base URLs; an empty list means the default local server.
+    - models (list): Model names.
+
+    Returns:
+    - list: (base_url or None, model) tuples.
+    """
+    return [(endpoint or None, model) for endpoint in (endpoints or [""]) for model in models]
+
+
+def run_fingerprint(descriptions, categories, shard_size):
+    """Identifies a run so checkpoints written for different input or settings are never reused."""
+    digest = hashlib.sha1()
+    for value in [*descriptions, "\0", *categories, "\0", str(shard_size)]:
+        digest.update(str(value).encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+def prepare_checkpoint_dir(checkpoint_dir, fingerprint, restart=False):
+    """Creates the checkpoint directory, clearing it when `restart` is set or it belongs to another run."""
+    manifest_path = os.path.join(checkpoint_dir, "manifest.json")
+    if os.path.exists(manifest_path) and not restart:
+        with open(manifest_path, encoding="utf-8") as f:
+            if json.load(f).get("fingerprint") == fingerprint:
+                return
+        print(f"Checkpoints in '{checkpoint_dir}' belong to a different run; starting over.")
+    if os.path.isdir(checkpoint_dir):
+        shutil.rmtree(checkpoint_dir)
+    os.makedirs(checkpoint_dir)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fingerprint}, f)
+
+
+def shard_paths(checkpoint_dir, shard_id):
+    base = os.path.join(checkpoint_dir, f"shard_{shard_id:05d}")
+    return base + ".csv", base + ".done"
+
+
+def read_checkpoint(path):
+    """Reads the rows recorded for a shard so far; an empty frame if nothing was written yet."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["Transaction", "Category"])
+    # A crash mid-write can leave a truncated last line; skip it and let that batch be redone
+    return pd.read_csv(path, dtype=str, keep_default_na=False, on_bad_lines="skip")
+
+
+def categorize_shard(shard_id, descriptions, categories, target, checkpoint_dir, batch_size, workers):
+    """
+    Categorizes one shard in a worker process, appending every finished batch to its checkpoint.
+
+    Descriptions already in the shard's checkpoint are skipped, so an interrupted shard resumes
+    at batch granularity. A '.done' marker is written once the whole shard is categorized.
+
+    Returns:
+    - tuple: (shard_id, number of descriptions categorized in this call)
+    """
+    base_url, model = target
+    categorization.llm = initialize_llm(model, base_url=base_url)
+
+    csv_path, done_path = shard_paths(checkpoint_dir, shard_id)
+    finished = set(read_checkpoint(csv_path)["Transaction"])
+    remaining = [description for description in descriptions if description not in finished]
+
+    categorized = 0
+    steps = categorization.iter_transactions_in_batches(
+        pd.DataFrame({"Name / Description": remaining}), categories,
+        batch_size=batch_size, max_workers=workers,
+    )
+    for categories_df, _, _ in steps:
+        # Append and flush after every batch so a crash loses at most the batches in flight
+        with open(csv_path, "a", encoding="utf-8", newline="") as f:
+            categories_df.to_csv(f, header=f.tell() == 0, index=False)
+            f.flush()
+            os.fsync(f.fileno())
+        categorized += len(categories_df)
+
+    open(done_path, "w").close()
+    return shard_id, categorized
+
+
+def load_input(path):
+    """
+    Reads the CSV to categorize, keeping only the input's own columns.
+
+    Categories from an earlier run and the unnamed index column of a frame saved with its index
+    are dropped, so an already categorized file can be categorized again. The rows are not
+    prepared, so the output keeps the input's formatting.
+
+    Parameters:
+    - path (str): CSV file to categorize.
+
+    Returns:
+    - DataFrame: The input rows without result or index columns.
+    """
+    df = pd.read_csv(path)
+    df = df.drop(columns=[column for column in df.columns
+                          if column in RESULT_COLUMNS or str(column).startswith("Unnamed: ")])
+    if not validate_columns(df, REQUIRED_COLUMNS):
+        raise ValueError(f"The input file must contain the following columns: {REQUIRED_COLUMNS}")
+    return df
+
+
+def run(args):
+    """Shards, categorizes and merges the input file according to the parsed command-line `args`."""
+    categories = categorization.resolve_categories(
+        [category.strip() for category in args.categories.split(",") if category.strip()] if args.categories else None
+    )
+    df = load_input(args.input)
+    index = DescriptionIndex(df["Name / Description"])
+    descriptions = index.representatives
+
+    prepare_checkpoint_dir(args.checkpoint_dir, run_fingerprint(descriptions, categories, args.shard_size), args.restart)
+
+    shards = [descriptions[i:i + args.shard_size] for i in range(0, len(descriptions), args.shard_size)]
+    targets = build_targets(
+        [endpoint.strip() for endpoint in args.endpoints.split(",") if endpoint.strip()],
+        [model.strip() for model in args.models.split(",") if model.strip()],
+    )
+    todo = [i for i in range(len(shards)) if not os.path.exists(shard_paths(args.checkpoint_dir, i)[1])]
+    print(f"{len(descriptions)} unique descriptions in {len(shards)} shards; "
+          f"{len(shards) - len(todo)} already done, {len(todo)} to go on {len(targets)} target(s).")
+
+    # One process per target by default, so a single local Ollama gets `workers` requests at a time
+    processes = args.processes or min(os.cpu_count() or 1, len(targets))
+    if todo:
+        print(f"Up to {min(processes, len(todo)) * args.workers} concurrent LLM requests "
+              f"({min(processes, len(todo))} process(es) x {args.workers} worker(s)).")
+        with ProcessPoolExecutor(max_workers=max(1, min(processes, len(todo)))) as executor:
+            futures = [
+                executor.submit(
+                    categorize_shard, i, shards[i], categories, targets[i % len(targets)],
+                    args.checkpoint_dir, args.batch_size, args.workers,
+                )
+                for i in todo
+            ]
+            for future in as_completed(futures):
+                try:
+                    shard_id, categorized = future.result()
+                except categorization.LLMUnavailableError as e:
+                    # Every shard would fail the same way; finished batches stay in the checkpoints
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise SystemExit(f"Stopped: {e}. Rerun the same command to resume from the checkpoints.")
+                print(f"Shard {shard_id} done ({categorized} descriptions categorized).")
+
+    # Merge every shard's checkpoint back onto the full data
+    checkpoints = pd.concat([read_checkpoint(shard_paths(args.checkpoint_dir, i)[0]) for i in range(len(shards))],
+                            ignore_index=True)
+    key_of = dict(zip(index.representatives, index.keys))
+    key_to_category = {key_of[name]: category for name, category in zip(checkpoints["Transaction"], checkpoints["Category"])
+                       if name in key_of}
+    merged = categorization.merge_categories(df, index.fan_out(key_to_category))
+    df = df.assign(Category=merged["Category"].to_numpy())
+    categorization.save_data(df, args.output)
+    print(f"Wrote {len(df)} rows to {args.output}.")
+    return df
+
+
+def main(argv=None):
+    run(parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
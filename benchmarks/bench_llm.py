@@ -0,0 +1,151 @@
+# benchmarks/bench_llm.py
+#
+# Offline LLM throughput benchmarks against the fake Ollama server.
+# Run from the repository root:  python -m benchmarks.bench_llm --sizes 200,1000 --concurrency 1,4,8
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import statistics
+import time
+
+import pandas as pd
+
+import categorization
+from model import initialize_llm
+from benchmarks.fake_ollama import FakeOllamaServer
+
+SYLLABLES = ["ka", "lo", "mi", "ra", "ven", "tor", "sel", "dun", "bri", "mar", "cos", "pel", "fin", "gro", "sta"]
+SUFFIXES = ["Store", "Market", "Cafe", "Services", "Pharmacy", "Garage", "Cinema", "Bakery", "Studio", "Travel"]
+
+CHAT_QUESTIONS = [
+    "How can I cut down my spending next month?",
+    "Is my saving behaviour healthy?",
+    "What should I budget for groceries?",
+]
+
+
+def synthetic_descriptions(count, seed=0):
+    """Generates `count` distinct merchant descriptions that do not collapse under canonicalization."""
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < count:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        names.add(f"{word} {rng.choice(SUFFIXES)}")
+    return sorted(names)
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def bench_categorization(size, batch_size, concurrency):
+    """Categorizes `size` distinct descriptions through the LLM path and returns throughput figures."""
+    df = pd.DataFrame({"Name / Description": synthetic_descriptions(size)})
+    timings = []
+    started = time.perf_counter()
+    # Silence the per-response logging so it does not distort the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = categorization.process_transactions_in_batches(
+            df, None, batch_size=batch_size, max_workers=concurrency, timings=timings,
+            use_cache=False, use_fast_path=False,
+        )
+    elapsed = time.perf_counter() - started
+    latencies = [timing["seconds"] for timing in timings]
+    return {
+        "benchmark": "categorization",
+        "rows": size,
+        "batch_size": batch_size,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(size / elapsed, 1) if elapsed else None,
+        "batches": len(timings),
+        "mean_batch_rows": round(statistics.mean(t["size"] for t in timings), 1) if timings else 0,
+        "p50_latency": round(percentile(latencies, 50), 3),
+        "p99_latency": round(percentile(latencies, 99), 3),
+        # Batches that needed a retry or came back incomplete (a retry that succeeded still cost a call)
+        "parse_failures": sum(1 for t in timings if t["attempts"] > 1 or t["parse_rate"] < 1),
+        # Labelled 'Miscellaneous' only because no answer could be parsed, not by the model
+        "fallback_rows": sum(t["fallback"] for t in timings),
+        "uncategorized": int(result["Category"].isna().sum()) + size - len(result),
+    }
+
+
+def bench_chat(llm, requests, concurrency):
+    """Sends free-form questions through llm_chat.generate_chat_response and returns latency figures."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    import llm_chat  # Heavy import (Whisper); only needed for the chat benchmark
+
+    llm_chat.llm = llm
+    df = pd.DataFrame({
+        "Date": ["2024-01-01"], "Name / Description": ["Coffee Shop"],
+        "Expense/Income": ["Expense"], "Amount (EUR)": [3.5], "Category": ["Food & Dining"],
+    })
+
+    def ask(i):
+        started = time.perf_counter()
+        llm_chat.generate_chat_response(CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)], df)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(ask, range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "benchmark": "chat",
+        "rows": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(requests / elapsed, 1) if elapsed else None,
+        "p50_latency": round(percentile(latencies, 50), 3),
+        "p99_latency": round(percentile(latencies, 99), 3),
+    }
+
+
+def parse_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark categorization and chat throughput offline.")
+    parser.add_argument("--sizes", default="200,1000", help="Comma-separated numbers of distinct descriptions")
+    parser.add_argument("--batch-sizes", default="5,10,25", help="Comma-separated initial batch sizes")
+    parser.add_argument("--concurrency", default="1,4,8", help="Comma-separated worker counts")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake server time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=400.0, help="Fake server generation speed")
+    parser.add_argument("--malformed-rate", type=float, default=0.05, help="Share of malformed answers")
+    parser.add_argument("--parallel", type=int, default=8, help="Requests the fake server serves at once")
+    parser.add_argument("--chat-requests", type=int, default=0, help="Chat questions per concurrency level (0 skips)")
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with FakeOllamaServer(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                          malformed_rate=args.malformed_rate, parallel=args.parallel) as server:
+        llm = initialize_llm("fake", base_url=server.base_url)
+        categorization.llm = llm
+        for size in parse_list(args.sizes):
+            for batch_size in parse_list(args.batch_sizes):
+                for concurrency in parse_list(args.concurrency):
+                    results.append(bench_categorization(size, batch_size, concurrency))
+                    print(results[-1])
+        if args.chat_requests:
+            for concurrency in parse_list(args.concurrency):
+                results.append(bench_chat(llm, args.chat_requests, concurrency))
+                print(results[-1])
+
+    print(pd.DataFrame(results).to_string(index=False))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+# benchmarks/bench_metrics.py
+#
+# Wall time and peak memory of every metric, chart builder and the dashboard date filter
+# on synthetic data of growing size.
+# Run from the repository root:  python -m benchmarks.bench_metrics --sizes 1000,100000,1000000
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import time
+import tracemalloc
+
+import pandas as pd
+
+import charts
+import metrics
+from benchmarks.synthetic import generate_transactions
+from result_cache import forget_frame
+from schema import prepare_transactions
+
+# Dashboard chart builders, called with the (filtered) transaction frame
+FRAME_CHARTS = {
+    "time_series_line_chart": charts.time_series_line_chart,
+    "stacked_area_chart": charts.stacked_area_chart,
+    "category_bar_chart": charts.category_bar_chart,
+    "pie_chart": charts.pie_chart,
+    "bubble_chart": charts.bubble_chart,
+    "monthly_breakdown_chart": charts.monthly_breakdown_chart,
+    "cumulative_sum_line_chart": charts.cumulative_sum_line_chart,
+    "heatmap_transaction_frequency": charts.heatmap_transaction_frequency,
+}
+
+# Chat plot helpers, called with the result of the metric they plot
+RESULT_CHARTS = {
+    "plot_top_categories": ("top spending categories", charts.plot_top_categories),
+    "plot_monthly_growth": ("monthly growth rate", charts.plot_monthly_growth),
+    "plot_yearly_summary": ("yearly summary", charts.plot_yearly_summary),
+}
+
+BUDGETS = {"Food & Dining": 400.0, "Transportation": 150.0}
+METRIC_PARAMS = {
+    "budget variance": {"budget_dict": BUDGETS},
+    "budget status": {"budget_dict": BUDGETS, "rollover": "full"},
+}
+
+
+def measure(func, repeat=1):
+    """
+    Runs `func` `repeat` times and returns its best wall time and the peak memory it allocated.
+
+    Streamlit output (warnings about running outside `streamlit run`) is silenced.
+
+    Returns:
+    - dict: 'seconds' (best of the runs), 'peak_mb' (traced allocations of the first run), and
+      'error' when the call raised.
+    """
+    best = None
+    peak = None
+    for run in range(repeat):
+        if run == 0:
+            tracemalloc.start()
+        started = time.perf_counter()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                func()
+        except Exception as e:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            return {"seconds": None, "peak_mb": None, "error": f"{type(e).__name__}: {e}"}
+        elapsed = time.perf_counter() - started
+        if run == 0:
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+        best = elapsed if best is None else min(best, elapsed)
+    return {"seconds": round(best, 6), "peak_mb": round(peak, 3)}
+
+
+def bench_size(rows, repeat, max_chart_rows, seed=0):
+    """Benchmarks every operation on `rows` synthetic transactions and returns one record per operation."""
+    records = []
+
+    def record(group, name, result):
+        records.append({"rows": rows, "group": group, "name": name, **result})
+        print(records[-1])
+
+    raw = generate_transactions(rows, seed=seed)
+    record("ingest", "prepare_transactions", measure(lambda raw=raw: prepare_transactions(raw), repeat))
+    df = prepare_transactions(raw)
+    del raw
+
+    # Metrics: 'cold' rebuilds the shared aggregates every run, 'warm' reuses the ones built for the frame
+    for command, (metric_func, _) in metrics.command_map.items():
+        if metric_func is None:
+            continue
+        params = METRIC_PARAMS.get(command, {})
+
+        def cold(metric_func=metric_func, params=params):
+            forget_frame(df)
+            metric_func(df, **params)
+
+        record("metric_cold", command, measure(cold, repeat))
+        record("metric_warm", command, measure(lambda metric_func=metric_func, params=params: metric_func(df, **params), repeat))
+
+    def batch():
+        forget_frame(df)
+        metrics.metric_cache.clear()
+        metrics.evaluate(df, list(metrics.command_map), METRIC_PARAMS)
+
+    record("metric_batch", "metrics.evaluate(all)", measure(batch, repeat))
+
+    # A rerun asks for the same metrics again, so every lookup should hit the metric cache
+    before = metrics.cache_stats()
+    rerun = measure(lambda: metrics.evaluate(df, list(metrics.command_map), METRIC_PARAMS), repeat)
+    after = metrics.cache_stats()
+    record("metric_batch", "metrics.evaluate(all)_rerun", {
+        **rerun, "cache_hits": after["hits"] - before["hits"], "cache_misses": after["misses"] - before["misses"],
+    })
+
+    # Dashboard date filter: first selection of a range, then the same range again (a rerun)
+    start, end = df["Date"].quantile(0.25), df["Date"].quantile(0.75)
+
+    def filter_cold():
+        forget_frame(df)
+        metrics.metric_cache.clear()
+        metrics.filter_date_range(df, start, end)
+
+    record("layout", "filter_date_range_cold", measure(filter_cold, repeat))
+    record("layout", "filter_date_range_rerun", measure(lambda: metrics.filter_date_range(df, start, end), repeat))
+    filtered = metrics.filter_date_range(df, start, end)
+
+    for name, builder in FRAME_CHARTS.items():
+        if rows > max_chart_rows:
+            record("chart", name, {"seconds": None, "peak_mb": None, "skipped": f"more than {max_chart_rows} rows"})
+            continue
+        record("chart", name, measure(lambda builder=builder: builder(filtered), repeat))
+    for name, (command, builder) in RESULT_CHARTS.items():
+        result = metrics.command_map[command][0](df)
+        record("chart", name, measure(lambda builder=builder, result=result: builder(result), repeat))
+    return records
+
+
+def parse_list(value):
+    return [int(item) for item in value.split(",") if item.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark metrics, charts and the dashboard date filter.")
+    parser.add_argument("--sizes", default="1000,10000,100000,1000000",
+                        help="Comma-separated row counts (up to 10000000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per operation; the best time is kept")
+    parser.add_argument("--max-chart-rows", type=int, default=1_000_000,
+                        help="Skip the frame chart builders above this many rows")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_metrics.json", help="JSON file for the results")
+    args = parser.parse_args(argv)
+
+    records = []
+    for rows in parse_list(args.sizes):
+        records.extend(bench_size(rows, args.repeat, args.max_chart_rows, args.seed))
+
+    results = pd.DataFrame(records)
+    print(results.pivot_table(index=["group", "name"], columns="rows", values="seconds", aggfunc="first").to_string())
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "results": records,
+        }, f, indent=2, default=str)
+    print(f"Wrote {len(records)} results to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
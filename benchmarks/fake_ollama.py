@@ -0,0 +1,156 @@
+# benchmarks/fake_ollama.py
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Marker the categorization prompt puts in front of the transaction list
+TRANSACTIONS_MARKER = "(one per line):\n"
+
+FILLER_WORDS = (
+    "your spending on dining rose this month while utilities stayed flat so consider "
+    "moving part of the surplus into savings and reviewing recurring subscriptions"
+).split()
+
+
+class FakeOllamaServer:
+    """
+    Local stand-in for the Ollama HTTP API used by `model.initialize_llm`.
+
+    Answers POST /api/generate with a newline-delimited JSON stream like Ollama does. Categorization
+    prompts get one 'Transaction - Category' line per transaction; any other prompt gets
+    `chat_tokens` words of filler text. Responses wait `latency` seconds before the first token and
+    then stream at `tokens_per_second`. With probability `malformed_rate` a categorization answer
+    is malformed (lines dropped or free text instead of the format). At most `parallel` requests are
+    served at once, like OLLAMA_NUM_PARALLEL.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, tokens_per_second=200.0,
+                 malformed_rate=0.0, parallel=4, chat_tokens=60, seed=0):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.malformed_rate = malformed_rate
+        self.chat_tokens = chat_tokens
+        self.slots = threading.BoundedSemaphore(parallel)
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.requests = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _chance(self, probability):
+        with self.random_lock:
+            return self.random.random() < probability
+
+    def answer(self, prompt):
+        """Builds the full response text for a prompt."""
+        if TRANSACTIONS_MARKER not in prompt:
+            return " ".join(FILLER_WORDS[i % len(FILLER_WORDS)] for i in range(self.chat_tokens))
+
+        names = [name for name in prompt.split(TRANSACTIONS_MARKER, 1)[1].split("\n") if name.strip()]
+        match = re.search(r"general categories: (.*?)\. Only use", prompt)
+        categories = match.group(1).split(", ") if match else ["Miscellaneous"]
+        lines = [f"{i + 1}. {name} - {categories[len(name) % len(categories)]}" for i, name in enumerate(names)]
+
+        if self._chance(self.malformed_rate):
+            if self._chance(0.5):
+                return "Sure! Here are the categories you asked for."
+            lines = [line for line in lines if not self._chance(0.5)]
+        return "\n".join(lines)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": "fake"}]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if self.path not in ("/api/generate", "/api/chat"):
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                prompt = body.get("prompt") or "\n".join(m.get("content", "") for m in body.get("messages", []))
+                model = body.get("model", "fake")
+
+                with server.slots:
+                    server.requests += 1
+                    tokens = re.findall(r"\S+\s*", server.answer(prompt))
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.end_headers()
+                    time.sleep(server.latency)
+                    started = time.perf_counter()
+                    for i, token in enumerate(tokens):
+                        # Pace the stream to the configured generation speed
+                        delay = started + (i + 1) / server.tokens_per_second - time.perf_counter()
+                        if delay > 0:
+                            time.sleep(delay)
+                        self._write_line({"model": model, "response": token, "done": False})
+                    self._write_line({"model": model, "response": "", "done": True, "eval_count": len(tokens)})
+
+            def _write_line(self, payload):
+                self.wfile.write(json.dumps(payload).encode("utf-8") + b"\n")
+                self.wfile.flush()
+
+            def _send_json(self, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server for offline benchmarks.")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--parallel", type=int, default=4, help="Requests served at once")
+    args = parser.parse_args(argv)
+    server = FakeOllamaServer(port=args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+                              malformed_rate=args.malformed_rate, parallel=args.parallel)
+    print(f"Fake Ollama listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
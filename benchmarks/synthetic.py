@@ -0,0 +1,157 @@
+# benchmarks/synthetic.py
+#
+# Synthetic transactions in the transactions.csv layout, for benchmarks at any size.
+# Run from the repository root:  python -m benchmarks.synthetic 100000 synthetic_transactions.csv
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from schema import DATE_FORMAT
+
+# (description, category, type, median amount, amount spread (log-normal sigma), relative frequency)
+MERCHANTS = [
+    ("Albert Heijn", "Food & Dining", "Expense", 35.0, 0.6, 14.0),
+    ("Lidl", "Food & Dining", "Expense", 28.0, 0.6, 10.0),
+    ("Jumbo Supermarkt", "Food & Dining", "Expense", 32.0, 0.6, 8.0),
+    ("Starbucks", "Food & Dining", "Expense", 5.5, 0.3, 9.0),
+    ("Thuisbezorgd", "Food & Dining", "Expense", 27.0, 0.4, 5.0),
+    ("McDonald's", "Food & Dining", "Expense", 11.0, 0.4, 4.0),
+    ("Local Bakery", "Food & Dining", "Expense", 6.0, 0.4, 5.0),
+    ("Restaurant De Kas", "Food & Dining", "Expense", 85.0, 0.5, 1.0),
+    ("Shell Station", "Transportation", "Expense", 65.0, 0.3, 4.0),
+    ("NS Reizigers", "Transportation", "Expense", 18.0, 0.7, 6.0),
+    ("Uber", "Transportation", "Expense", 22.0, 0.5, 3.0),
+    ("Q-Park", "Transportation", "Expense", 9.0, 0.5, 2.0),
+    ("Pathe Cinema", "Entertainment", "Expense", 14.0, 0.3, 2.0),
+    ("Steam Games", "Entertainment", "Expense", 25.0, 0.8, 1.0),
+    ("Ticketmaster", "Entertainment", "Expense", 70.0, 0.6, 0.5),
+    ("Bol.com", "Miscellaneous", "Expense", 40.0, 0.9, 4.0),
+    ("Amazon Purchase", "Miscellaneous", "Expense", 35.0, 0.9, 4.0),
+    ("IKEA", "Miscellaneous", "Expense", 120.0, 0.8, 0.7),
+    ("HEMA", "Miscellaneous", "Expense", 15.0, 0.6, 2.0),
+    ("Kruidvat Pharmacy", "Health & Wellness", "Expense", 16.0, 0.6, 3.0),
+    ("Dentist Practice", "Health & Wellness", "Expense", 90.0, 0.4, 0.3),
+    ("Basic-Fit Day Pass", "Health & Wellness", "Expense", 10.0, 0.2, 0.5),
+    ("Tikkie Payment Received", "Income", "Income", 25.0, 0.8, 2.0),
+    ("Marktplaats Sale", "Income", "Income", 45.0, 0.9, 0.5),
+]
+
+# (description, category, type, amount, amount jitter, day of month) charged once a month
+MONTHLY = [
+    ("Salary Acme BV", "Income", "Income", 3200.0, 0.0, 25),
+    ("Rent Payment", "Utilities & Bills", "Expense", 1250.0, 0.0, 1),
+    ("Vattenfall Energy", "Utilities & Bills", "Expense", 140.0, 0.15, 5),
+    ("Ziggo Internet", "Utilities & Bills", "Expense", 55.0, 0.0, 8),
+    ("Health Insurance", "Health & Wellness", "Expense", 138.0, 0.0, 1),
+    ("Spotify AB", "Entertainment", "Expense", 10.99, 0.0, 14),
+    ("Netflix", "Entertainment", "Expense", 13.99, 0.0, 19),
+    ("Basic-Fit Membership", "Health & Wellness", "Expense", 29.99, 0.0, 27),
+]
+
+# Hour-of-day weights for card purchases (quiet at night, peaks at lunch and early evening)
+HOUR_WEIGHTS = np.array([1, 0.5, 0.3, 0.2, 0.2, 0.4, 1, 3, 5, 6, 7, 8, 10, 8, 7, 7, 8, 10, 11, 9, 7, 5, 3, 2], dtype=float)
+# More shopping towards the weekend (Monday first)
+WEEKDAY_WEIGHTS = np.array([0.9, 0.9, 1.0, 1.0, 1.2, 1.5, 0.8])
+
+
+def _variant(rng, names, share):
+    """Adds bank noise (card suffixes, reference numbers) to a share of the descriptions."""
+    noisy = rng.random(len(names)) < share
+    if noisy.any():
+        suffixes = np.char.add(" REF ", rng.integers(100000, 999999, noisy.sum()).astype(str))
+        names = names.astype(object)
+        names[noisy] = np.char.add(names[noisy].astype(str), suffixes)
+    return names
+
+
+def generate_transactions(rows, seed=0, years=3, end="2024-12-31", noise=0.1):
+    """
+    Generates `rows` synthetic transactions with the columns of transactions.csv plus 'Category'.
+
+    Card purchases draw merchants by popularity, log-normal amounts per merchant, and dates
+    weighted by weekday and hour over `years` years up to `end`. Salary, rent, utilities and
+    subscriptions recur monthly on a fixed day. A `noise` share of purchase descriptions carry a
+    reference number, as bank exports do. Generation is vectorized, so 10M rows are practical.
+
+    Parameters:
+    - rows (int): Number of transactions.
+    - seed (int): Random seed; the same seed gives the same data.
+    - years (int): Length of the history.
+    - end (str): Last day of the history.
+    - noise (float): Share of descriptions with a reference number appended.
+
+    Returns:
+    - DataFrame: 'Date', 'Name / Description', 'Expense/Income', 'Amount (EUR)', 'Category', sorted by date.
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end).normalize()
+    start = end - pd.DateOffset(years=years) + pd.Timedelta(days=1)
+
+    month_starts = pd.date_range(start, end, freq="MS")
+    recurring_count = min(rows, len(month_starts) * len(MONTHLY))
+    monthly_index = np.arange(recurring_count)
+    recurring = [MONTHLY[i] for i in monthly_index % len(MONTHLY)]
+    recurring_dates = (
+        month_starts[monthly_index // len(MONTHLY)].to_numpy()
+        + (np.array([item[5] for item in recurring]) - 1).astype("timedelta64[D]")
+        + np.timedelta64(6, "h")
+    )
+    recurring_amounts = np.array([item[3] for item in recurring]) * (
+        1 + np.array([item[4] for item in recurring]) * rng.standard_normal(recurring_count)
+    )
+
+    purchases = rows - recurring_count
+    weights = np.array([merchant[5] for merchant in MERCHANTS])
+    picks = rng.choice(len(MERCHANTS), size=purchases, p=weights / weights.sum())
+    days = pd.date_range(start, end, freq="D")
+    day_weights = WEEKDAY_WEIGHTS[days.dayofweek]
+    purchase_days = days.to_numpy()[rng.choice(len(days), size=purchases, p=day_weights / day_weights.sum())]
+    hours = rng.choice(24, size=purchases, p=HOUR_WEIGHTS / HOUR_WEIGHTS.sum())
+    seconds = hours * 3600 + rng.integers(0, 3600, purchases)
+    purchase_dates = (
+        purchase_days + seconds.astype("timedelta64[s]") + rng.integers(0, 10**6, purchases).astype("timedelta64[us]")
+    )
+    medians = np.array([merchant[3] for merchant in MERCHANTS])
+    sigmas = np.array([merchant[4] for merchant in MERCHANTS])
+    purchase_amounts = medians[picks] * np.exp(sigmas[picks] * rng.standard_normal(purchases))
+
+    merchant_names = np.array([merchant[0] for merchant in MERCHANTS], dtype=object)
+    df = pd.DataFrame({
+        "Date": np.concatenate([recurring_dates.astype("datetime64[ns]"), purchase_dates.astype("datetime64[ns]")]),
+        "Name / Description": np.concatenate([
+            np.array([item[0] for item in recurring], dtype=object),
+            _variant(rng, merchant_names[picks], noise),
+        ]),
+        "Expense/Income": np.concatenate([
+            np.array([item[2] for item in recurring], dtype=object),
+            np.array([merchant[2] for merchant in MERCHANTS], dtype=object)[picks],
+        ]),
+        "Amount (EUR)": np.round(np.concatenate([recurring_amounts, purchase_amounts]), 2),
+        "Category": np.concatenate([
+            np.array([item[1] for item in recurring], dtype=object),
+            np.array([merchant[1] for merchant in MERCHANTS], dtype=object)[picks],
+        ]),
+    })
+    return df.sort_values("Date", kind="stable", ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write synthetic transactions in the transactions.csv layout.")
+    parser.add_argument("rows", type=int, help="Number of transactions")
+    parser.add_argument("output", help="CSV file to write")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--years", type=int, default=3, help="Length of the history in years")
+    parser.add_argument("--uncategorized", action="store_true", help="Leave out the 'Category' column")
+    args = parser.parse_args(argv)
+
+    df = generate_transactions(args.rows, seed=args.seed, years=args.years)
+    if args.uncategorized:
+        df = df.drop(columns="Category")
+    df.to_csv(args.output, index=False, date_format=DATE_FORMAT)
+    print(f"Wrote {len(df)} rows to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+# budgets.py
+
+import copy
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from aggregates import AggregateCube, get_cube
+from result_cache import freeze, frame_memo, peek_frame, remember_frame
+from utils import format_currency
+
+# How the unspent (or overspent) part of a month's budget carries into the next month
+#   none:    every month starts from its own budget
+#   full:    leftovers and overspending both carry forward
+#   surplus: only leftovers carry forward; an overspent month resets the carry to zero
+#   deficit: only overspending carries forward (it is taken from the next budgets)
+ROLLOVER_RULES = ("none", "full", "surplus", "deficit")
+
+# Share of the available budget at which an alert is raised
+DEFAULT_THRESHOLDS = (0.8, 1.0)
+
+STATUS_COLUMNS = ["Budget", "Carried Over", "Available", "Spent", "Remaining", "Utilization"]
+
+ALERT_COLUMNS = ["Month", "Category", "Threshold", "Spent", "Available", "Utilization"]
+
+# Budgets set only for some months, with no earlier entry, leave the months before them unbudgeted
+_DEFAULT_KEY = "default"
+
+
+def _to_month(value):
+    return value if isinstance(value, pd.Period) else pd.Period(value, freq="M")
+
+
+def budget_matrix(budgets, month_index):
+    """
+    Expands budgets to a month x category matrix.
+
+    Parameters:
+    - budgets (dict): Category to either a monthly amount, or to {month: amount} where a month's
+      amount applies until the next month listed; a "default" entry covers the months before the
+      first one listed.
+    - month_index (PeriodIndex): The months (rows) of the matrix.
+
+    Returns:
+    - DataFrame: Budget amounts with months as rows and categories as columns; NaN where a
+      category has no budget for that month.
+    """
+    columns = {}
+    for category, amounts in budgets.items():
+        if not isinstance(amounts, dict):
+            columns[category] = np.full(len(month_index), float(amounts))
+            continue
+        default = amounts.get(_DEFAULT_KEY, np.nan)
+        listed = pd.Series(
+            {_to_month(month): float(amount) for month, amount in amounts.items() if month != _DEFAULT_KEY},
+            dtype=np.float64,
+        ).sort_index()
+        # Each listed amount holds from its month until the next listed month
+        positions = listed.index.searchsorted(month_index, side="right") - 1 if len(listed) else np.full(len(month_index), -1)
+        values = np.append(listed.to_numpy(), default)
+        columns[category] = values[np.where(positions >= 0, positions, len(listed))]
+    return pd.DataFrame(columns, index=month_index, dtype=np.float64)
+
+
+def rollover_codes(rollover, categories):
+    """Index into ROLLOVER_RULES per category, from one rule for all or a {category: rule} dict."""
+    rules = rollover if isinstance(rollover, dict) else {}
+    default = "none" if isinstance(rollover, dict) else (rollover or "none")
+    codes = []
+    for category in categories:
+        rule = rules.get(category, default)
+        if rule not in ROLLOVER_RULES:
+            raise ValueError(f"Unknown rollover rule '{rule}'; expected one of {ROLLOVER_RULES}.")
+        codes.append(ROLLOVER_RULES.index(rule))
+    return np.array(codes, dtype=np.int8)
+
+
+def carry_forward(difference, codes, initial=None):
+    """
+    Carry out of every month for all categories at once.
+
+    With d the monthly (budget - spent), the carries follow c[t] = rule(c[t-1] + d[t]). Each rule
+    has a closed form over the running sum S of d: 'full' is c0 + S, 'surplus' (clamped at zero
+    from below) is S - min(-c0, running min of S), and 'deficit' is S - max(-c0, running max of S).
+    The whole matrix is therefore three cumulative array operations, with no loop over months.
+
+    Parameters:
+    - difference (ndarray): months x categories of budget minus spent (zero where unbudgeted).
+    - codes (ndarray): Rollover rule per category (see `rollover_codes`).
+    - initial (ndarray): Carry into the first row per category (default zero).
+
+    Returns:
+    - ndarray: months x categories of the carry out of each month.
+    """
+    initial = np.zeros(difference.shape[1]) if initial is None else initial
+    running = np.cumsum(difference, axis=0)
+    full = initial + running
+    surplus = running - np.minimum(-initial, np.minimum.accumulate(running, axis=0))
+    deficit = running - np.maximum(-initial, np.maximum.accumulate(running, axis=0))
+    return np.select([codes == 1, codes == 2, codes == 3], [full, surplus, deficit], default=0.0)
+
+
+def monthly_spending(source, categories, month_index=None):
+    """
+    Expense totals as a month x category matrix, read from the aggregate cube.
+
+    Parameters:
+    - source (DataFrame, out-of-core source or AggregateCube): The transactions.
+    - categories (list): The categories (columns) to keep.
+    - month_index (PeriodIndex): The months (rows); default every month from the first to the
+      last transaction, including months without any.
+
+    Returns:
+    - DataFrame: Spending with months as rows and categories as columns (zero where nothing was spent).
+    """
+    cube = source if isinstance(source, AggregateCube) else get_cube(source)
+    spent = cube.by(["Month", "Category"], "Expense")
+    if month_index is None:
+        observed = spent.index.get_level_values("Month")
+        month_index = pd.period_range(observed.min(), observed.max(), freq="M", name="Month") if len(observed) else pd.PeriodIndex([], freq="M", name="Month")
+    matrix = spent.unstack("Category") if len(spent) else pd.DataFrame(index=pd.PeriodIndex([], freq="M"))
+    matrix.columns = matrix.columns.astype(object)
+    return matrix.reindex(index=month_index, columns=list(categories)).fillna(0.0)
+
+
+class BudgetTracker:
+    """
+    Per-month, per-category budgets evaluated against spending as one month x category matrix.
+
+    Budgets, rollover carries, available amounts and utilization are whole-matrix array
+    operations over the monthly totals of the aggregate cube, so years of history across dozens
+    of categories cost a handful of vectorized steps. Appended transactions update only the months
+    they touch and the carries after them, and report the budgets whose utilization crossed an
+    alert threshold.
+    """
+
+    def __init__(self, budgets, rollover="none", thresholds=DEFAULT_THRESHOLDS):
+        self.budgets = budgets
+        self.categories = list(budgets)
+        self.codes = rollover_codes(rollover, self.categories)
+        self.thresholds = np.array(sorted(thresholds), dtype=np.float64)
+        self.month_index = pd.PeriodIndex([], freq="M", name="Month")
+        self.spent = np.zeros((0, len(self.categories)))
+        self.budget = np.zeros((0, len(self.categories)))
+        self.carry = np.zeros((0, len(self.categories)))
+
+    @classmethod
+    def from_transactions(cls, source, budgets, rollover="none", thresholds=DEFAULT_THRESHOLDS):
+        """Builds a tracker over existing transactions (a frame, an out-of-core source or a cube)."""
+        tracker = cls(budgets, rollover, thresholds)
+        tracker._set_spending(monthly_spending(source, tracker.categories))
+        return tracker
+
+    def _set_spending(self, spending, start=0):
+        """Takes the spending matrix and recomputes budgets and carries from row `start` on."""
+        self.month_index = spending.index
+        self.spent = spending.to_numpy(dtype=np.float64)
+        if len(self.budget) != len(self.month_index):
+            self.budget = budget_matrix(self.budgets, self.month_index).to_numpy()
+        budgeted = ~np.isnan(self.budget)
+        difference = np.where(budgeted, np.nan_to_num(self.budget) - self.spent, 0.0)[start:]
+        initial = self.carry[start - 1] if start else None
+        self.carry = np.concatenate([self.carry[:start], carry_forward(difference, self.codes, initial)])
+
+    @property
+    def carried_over(self):
+        """Carry into each month (the previous month's carry out)."""
+        return np.vstack([np.zeros((1, len(self.categories))), self.carry[:-1]])[:len(self.month_index)]
+
+    @property
+    def available(self):
+        return self.budget + self.carried_over
+
+    @property
+    def utilization(self):
+        available = self.available
+        with np.errstate(divide="ignore", invalid="ignore"):
+            share = self.spent / available
+        # Spending against nothing left is over budget; nothing spent against nothing is not
+        share = np.where(available > 0, share, np.where(self.spent > 0, np.inf, 0.0))
+        return np.where(np.isnan(self.budget), np.nan, share)
+
+    def add(self, transactions):
+        """
+        Adds newly arrived transactions and returns the alerts they trigger.
+
+        Only the months the new rows fall in are updated, and only the carries from the first of
+        them onwards are recomputed.
+
+        Parameters:
+        - transactions (DataFrame or AggregateCube): The appended rows (or their cube).
+
+        Returns:
+        - DataFrame: One row per month, category and threshold newly reached (see `alerts`).
+        """
+        added = monthly_spending(transactions, self.categories)
+        added = added[added.any(axis=1)]
+        if added.empty:
+            return self._alert_frame(np.zeros((0, 3), dtype=np.int64))
+        before = self.utilization
+        month_index = self.month_index.union(added.index) if len(self.month_index) else added.index
+        month_index = pd.period_range(month_index.min(), month_index.max(), freq="M", name="Month")
+        spending = pd.DataFrame(self.spent, index=self.month_index, columns=self.categories).reindex(month_index, fill_value=0.0)
+        spending.loc[added.index] += added.to_numpy()
+        # Months prepended to the history shift every row, so everything is recomputed then
+        shift = int(month_index.get_loc(self.month_index[0])) if len(self.month_index) else 0
+        before = np.vstack([np.full((shift, len(self.categories)), np.nan), before,
+                            np.full((len(month_index) - shift - len(before), len(self.categories)), np.nan)])
+        # New months after the old end (even ones without spending) need their carries computed too
+        start = 0 if shift else min(int(month_index.get_loc(added.index.min())), len(self.month_index))
+        self._set_spending(spending, start)
+        return self.alerts(previous=before)
+
+    def alerts(self, previous=None):
+        """
+        Budgets at or above an alert threshold, or newly crossing one since `previous`.
+
+        Parameters:
+        - previous (ndarray): Utilization matrix from before an update; when given, only the
+          thresholds crossed since then are reported.
+
+        Returns:
+        - DataFrame: ALERT_COLUMNS.
+        """
+        current = np.nan_to_num(self.utilization, nan=-np.inf)[:, :, None]
+        reached = current >= self.thresholds
+        if previous is not None:
+            reached &= ~(np.nan_to_num(previous, nan=-np.inf)[:, :, None] >= self.thresholds)
+        return self._alert_frame(np.argwhere(reached))
+
+    def _alert_frame(self, hits):
+        rows, columns, levels = hits.T if len(hits) else (np.zeros(0, dtype=np.int64),) * 3
+        return pd.DataFrame({
+            "Month": self.month_index[rows],
+            "Category": np.array(self.categories, dtype=object)[columns],
+            "Threshold": self.thresholds[levels],
+            "Spent": self.spent[rows, columns],
+            "Available": self.available[rows, columns],
+            "Utilization": self.utilization[rows, columns],
+        })
+
+    def status(self):
+        """
+        The budget state of every month and budgeted category.
+
+        Returns:
+        - DataFrame: Indexed by ('Month', 'Category') with STATUS_COLUMNS; months before a
+          category's first budget are left out.
+        """
+        index = pd.MultiIndex.from_product([self.month_index, self.categories], names=["Month", "Category"])
+        available = self.available
+        frame = pd.DataFrame({
+            "Budget": self.budget.ravel(),
+            "Carried Over": self.carried_over.ravel(),
+            "Available": available.ravel(),
+            "Spent": self.spent.ravel(),
+            "Remaining": (available - self.spent).ravel(),
+            "Utilization": self.utilization.ravel(),
+        }, index=index)
+        return frame[frame["Budget"].notna()]
+
+    def variance(self, month=None):
+        """
+        Spending minus the available budget per category for one month (default the latest).
+
+        Positive values are overspending. Categories without a budget that month are left out.
+        """
+        if not len(self.month_index):
+            return pd.Series(dtype=np.float64, name="Variance")
+        row = len(self.month_index) - 1 if month is None else self.month_index.get_loc(_to_month(month))
+        variance = pd.Series(self.spent[row] - self.available[row], index=self.categories, name="Variance")
+        return variance[~np.isnan(self.budget[row])]
+
+
+def get_budget_tracker(source, budgets, rollover="none"):
+    """
+    Returns the tracker of `budgets` over `source`, building it on first use.
+
+    Trackers of a frame are memoized on the frame object, one per budgets and rollover, so every
+    budget command over the same dataset shares one, and `extend_budget_trackers` carries them
+    over when rows are appended. Other sources get a fresh tracker.
+    """
+    if not isinstance(source, pd.DataFrame):
+        return BudgetTracker.from_transactions(source, budgets, rollover)
+    trackers = frame_memo(source, "budget_trackers", dict)
+    key = (freeze(budgets), freeze(rollover))
+    if key not in trackers:
+        trackers[key] = BudgetTracker.from_transactions(source, budgets, rollover)
+    return trackers[key]
+
+
+def extend_budget_trackers(previous, combined, budgets=None):
+    """
+    Carries the budget trackers of `previous` over to `combined` (its rows followed by appended
+    ones), updating each with just the appended rows.
+
+    The alerts the appended rows trigger are remembered on `combined` (see `appended_alerts`).
+
+    Parameters:
+    - previous (DataFrame): The frame before the append.
+    - combined (DataFrame): `previous` with the new rows appended.
+    - budgets (dict): Budgets to track even if no tracker was built for them yet (default the
+      saved budgets).
+    """
+    budgets = get_budgets() if budgets is None else budgets
+    if budgets:
+        get_budget_tracker(previous, budgets)
+    trackers = peek_frame(previous, "budget_trackers")
+    if not trackers:
+        return
+    appended = combined.iloc[len(previous):]
+    carried, alerts = {}, []
+    for key, tracker in trackers.items():
+        # `add` replaces the tracker's arrays rather than writing into them, so a shallow copy
+        # leaves the tracker of `previous` as it was
+        tracker = copy.copy(tracker)
+        alerts.append(tracker.add(appended))
+        carried[key] = tracker
+    remember_frame(combined, "budget_trackers", carried)
+    remember_frame(combined, "budget_alerts", pd.concat(alerts, ignore_index=True).drop_duplicates())
+
+
+def appended_alerts(df):
+    """
+    Alerts triggered by the rows appended to make `df` (see `BudgetTracker.alerts`), with only
+    the highest threshold crossed per month and category.
+    """
+    alerts = peek_frame(df, "budget_alerts")
+    if alerts is None:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    return alerts.sort_values("Threshold").drop_duplicates(["Month", "Category"], keep="last").reset_index(drop=True)
+
+
+def current_alerts(df, budgets=None, rollover="none"):
+    """
+    The alert thresholds reached in the latest month of `df`, the highest one per category.
+
+    Parameters:
+    - df (DataFrame): Transaction data.
+    - budgets (dict): Budgets to check (default the saved budgets).
+    - rollover: One of ROLLOVER_RULES, or a dict of them per category.
+    """
+    budgets = get_budgets() if budgets is None else budgets
+    if not budgets:
+        return pd.DataFrame(columns=ALERT_COLUMNS)
+    tracker = get_budget_tracker(df, budgets, rollover)
+    alerts = tracker.alerts()
+    if not len(tracker.month_index):
+        return alerts
+    alerts = alerts[alerts["Month"] == tracker.month_index[-1]]
+    return alerts.sort_values("Threshold").drop_duplicates("Category", keep="last").reset_index(drop=True)
+
+
+def alert_message(alert):
+    """One line describing an alert row (a namedtuple from `alerts.itertuples()`)."""
+    return (f"{alert.Category}: {alert.Utilization:.0%} of the {alert.Month} budget used "
+            f"({format_currency(alert.Spent)} of {format_currency(alert.Available)}).")
+
+
+def _saved_budgets():
+    """Budgets set during the session (e.g. from the chat), kept per user in the Streamlit session state."""
+    return st.session_state.setdefault("saved_budgets", {})
+
+
+def set_budget(category, amount, month=None):
+    """Sets a category's monthly budget, from `month` on when given, otherwise for every month."""
+    saved_budgets = _saved_budgets()
+    if month is None:
+        saved_budgets[category] = float(amount)
+        return
+    current = saved_budgets.get(category)
+    listed = dict(current) if isinstance(current, dict) else ({} if current is None else {_DEFAULT_KEY: current})
+    listed[str(_to_month(month))] = float(amount)
+    saved_budgets[category] = listed
+
+
+def get_budgets():
+    """Returns the budgets saved in this session (category to amount or {month: amount})."""
+    return dict(_saved_budgets())
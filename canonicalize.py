@@ -0,0 +1,135 @@
+# canonicalize.py
+
+import numpy as np
+import pandas as pd
+
+from category_cache import normalize_description
+from result_cache import frame_memo
+
+# Applied in order to lowercased descriptions; each match is replaced by a space
+CANONICAL_PATTERNS = [
+    r"\b\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}\b",                          # dates such as 2024-01-31 or 31/01/24
+    r"\b(?:\d{4}[-/.]\d{1,2}|\d{1,2}[-/.]\d{4})\b",                    # months such as 2024-01 or 01/2024
+    r"\b(?:card|crd|visa|mastercard)?\s*(?:x{2,}|\*{2,})\s*\d{2,4}\b",  # masked card suffixes such as XXXX1234
+    r"\bending in \d{2,4}\b",
+    r"\b(?:ref|reference|id|txn|trx|auth)\b[:#.]?\s*\S*\d\S*",          # labelled reference numbers
+    r"#\s*\S+",
+    r"\b(?:by|via)\s+(?:adyen|stripe|paypal|mollie|klarna|sumup)\b",  # payment processor suffixes
+    r"\b(?:paypal|sq|sp|pp)\s*\*",
+    r"\b\w*\d{3,}\w*\b",                                              # remaining tokens carrying long digit runs
+    r"[^\w&' ]+",                                                     # punctuation
+]
+
+
+def canonicalize(descriptions):
+    """
+    Reduces bank description variants to one canonical key.
+
+    Lowercases, strips dates, card suffixes, reference IDs and payment-processor suffixes, and
+    collapses whitespace, so "SPOTIFY AB 12345" and "Spotify AB by Adyen" both become "spotify ab".
+    Descriptions that would canonicalize to nothing keep their plain normalized form.
+
+    Parameters:
+    - descriptions (Series): Raw descriptions.
+
+    Returns:
+    - Series: Canonical keys, aligned with `descriptions`.
+    """
+    normalized = descriptions.astype(str).str.casefold()
+    canonical = normalized
+    for pattern in CANONICAL_PATTERNS:
+        canonical = canonical.str.replace(pattern, " ", regex=True)
+    canonical = canonical.str.replace(r"\s+", " ", regex=True).str.strip()
+    # Only descriptions left empty need the (slower, per-value) fallback
+    empty = canonical == ""
+    if empty.any():
+        canonical = canonical.copy()
+        canonical[empty] = normalized[empty].map(normalize_description)
+    return canonical
+
+
+class DescriptionIndex:
+    """
+    Index from canonical key to the raw descriptions that share it.
+
+    Categorization runs once per key (using the shortest raw description for it as the
+    representative), and `fan_out` maps the per-key results back onto every raw description.
+    """
+
+    def __init__(self, descriptions):
+        self.raw = pd.Series(pd.unique(descriptions.dropna().astype(str)), dtype=object)
+        self.codes, uniques = pd.factorize(canonicalize(self.raw))
+        self.keys = list(uniques)
+        shortest = self.raw.str.len().groupby(self.codes).idxmin().to_numpy()
+        self.representatives = self.raw.to_numpy()[shortest].tolist() if len(self.keys) else []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def fan_out(self, key_to_category, only_assigned=False):
+        """
+        Expands per-key categories to one row per raw description.
+
+        Parameters:
+        - key_to_category (dict): Canonical key to category; missing keys yield NaN.
+        - only_assigned (bool): Drop the raw descriptions whose key is not in `key_to_category`.
+
+        Returns:
+        - DataFrame: 'Transaction' (raw description) and 'Category' columns.
+        """
+        categories = np.array([key_to_category.get(key, np.nan) for key in self.keys], dtype=object)
+        fanned = pd.DataFrame({
+            "Transaction": self.raw.to_numpy(),
+            "Category": categories[self.codes] if len(self.keys) else np.array([], dtype=object),
+        })
+        if only_assigned:
+            fanned = fanned[fanned["Category"].notna()].reset_index(drop=True)
+        return fanned
+
+
+class MerchantCodes:
+    """
+    Canonical merchant of every row of a frame, as integer codes.
+
+    `raw_codes` numbers the distinct descriptions per row (-1 where missing) and `merchant_of_raw`
+    maps each distinct description to its canonical key in `merchants`, so every description is
+    canonicalized once. Appended rows only canonicalize the descriptions not seen before.
+    """
+
+    def __init__(self, descriptions):
+        self.raw_codes, raw_names = pd.factorize(descriptions)
+        self.raw_names = pd.Index(raw_names)
+        self.merchant_of_raw, merchants = pd.factorize(canonicalize(pd.Series(raw_names, dtype=object)))
+        self.merchants = pd.Index(merchants)
+
+    def __len__(self):
+        return len(self.raw_codes)
+
+    def extend(self, descriptions):
+        """
+        Codes of the rows followed by rows with `descriptions`, numbered as a rebuild would.
+
+        Returns:
+        - MerchantCodes: The extended codes (these are left unchanged).
+        """
+        codes = self.raw_names.get_indexer(descriptions)
+        unseen = (codes < 0) & descriptions.notna().to_numpy()
+        extended = object.__new__(MerchantCodes)
+        extended.raw_names, extended.merchant_of_raw, extended.merchants = self.raw_names, self.merchant_of_raw, self.merchants
+        if unseen.any():
+            new_names = pd.Index(pd.unique(descriptions[unseen]))
+            codes[unseen] = len(self.raw_names) + new_names.get_indexer(descriptions[unseen])
+            keys = canonicalize(pd.Series(new_names, dtype=object))
+            merchant_codes = self.merchants.get_indexer(keys)
+            new_merchants = pd.Index(pd.unique(keys[merchant_codes < 0]))
+            merchant_codes[merchant_codes < 0] = len(self.merchants) + new_merchants.get_indexer(keys[merchant_codes < 0])
+            extended.raw_names = self.raw_names.append(new_names)
+            extended.merchant_of_raw = np.concatenate([self.merchant_of_raw, merchant_codes])
+            extended.merchants = self.merchants.append(new_merchants)
+        extended.raw_codes = np.concatenate([self.raw_codes, codes])
+        return extended
+
+
+def get_merchant_codes(df):
+    """Returns the merchant codes of `df`, building them on first use (memoized on the frame object)."""
+    return frame_memo(df, "merchant_codes", lambda: MerchantCodes(df["Name / Description"]))
@@ -1,40 +1,54 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import pandas as pd
 from model import initialize_llm  # Import model initialization from model.py
-from utils import validate_columns  # Import utility function for column validation
+from schema import prepare_transactions, is_prepared, concat_prepared  # Typed ingestion shared by every entry point
+from category_cache import CategoryCache, normalize_description
+from adaptive_batcher import DEFAULT_CONTEXT_TOKENS, AdaptiveBatcher, estimate_tokens
+from fast_classifier import pre_classify
+from canonicalize import DescriptionIndex
+from aggregates import extend_aggregates
+from budgets import extend_budget_trackers
 
 # Initialize the LLM instance once for reuse across categorization functions
 llm = initialize_llm()
 
+# Persistent merchant-to-category cache shared by every categorization run
+category_cache = CategoryCache()
+
+# Number of batches sent to Ollama at once; match it to the server's OLLAMA_NUM_PARALLEL
+DEFAULT_MAX_WORKERS = int(os.environ.get("MOOSE_LLM_WORKERS", "4"))
+
 def load_data(uploaded_file):
-    """Load transaction data from the uploaded CSV file and validate required columns."""
-    df = pd.read_csv(uploaded_file)
-    required_columns = ["Name / Description", "Amount (EUR)"]
-    if not validate_columns(df, required_columns):
-        raise ValueError(f"The uploaded file must contain the following columns: {required_columns}")
-    return df
+    """Load transaction data from the uploaded CSV file, validate required columns and parse types once."""
+    return prepare_transactions(pd.read_csv(uploaded_file))
 
 def save_data(df, file_path):
     """Saves the DataFrame to a specified CSV file."""
     df.to_csv(file_path, index=False)
 
-def categorize_transactions(transaction_names, llm):
-    """
-    Categorize transactions using the LLM, restricted to predefined categories, with fallbacks for unmatched cases.
-    """
-    # Define the target general categories
-    general_categories = [
+def resolve_categories(categories=None):
+    """Return the caller's category list, or the default general categories when none is given."""
+    return list(categories) if categories else [
         "Food & Dining", "Utilities & Bills", "Transportation", 
         "Entertainment", "Health & Wellness", "Income", "Miscellaneous"
     ]
-    general_categories_str = ", ".join(general_categories)
+
+def build_categorization_prompt(transaction_names, categories=None):
+    """Build the categorization prompt for newline-separated transaction names."""
+    general_categories_str = ", ".join(resolve_categories(categories))
 
     # Define the prompt with examples and constraints
-    prompt = (
+    return (
     "You are a financial assistant categorizing expenses. Please categorize each of the following transactions "
     "into ONE of the following exact general categories: "
     f"{general_categories_str}. Only use one of these categories, and if a transaction does not clearly fit, "
     "categorize it as 'Miscellaneous'. Do not create any new categories.\n\n"
-    "Respond ONLY in the following strict format: 'Transaction - Category'. Do not include any extra information.\n\n"
+    "Respond ONLY in the following strict format, one line per transaction: 'Transaction - Category'. "
+    "Do not include any extra information.\n\n"
     "Examples:\n"
     "1. Spotify AB by Adyen - Entertainment\n"
     "2. Uber Ride - Transportation\n"
@@ -42,10 +56,17 @@ def categorize_transactions(transaction_names, llm):
     "4. Doctor's Visit - Health & Wellness\n"
     "5. Rent Payment - Utilities & Bills\n"
     "6. Freelance Payment - Income\n\n"
-    "Categorize the following transactions:\n"
+    "Categorize the following transactions (one per line):\n"
     + transaction_names
 )
 
+def categorize_transactions(transaction_names, llm, categories=None):
+    """
+    Categorize transactions using the LLM, restricted to predefined categories, with fallbacks for unmatched cases.
+    """
+    general_categories = resolve_categories(categories)
+    prompt = build_categorization_prompt(transaction_names, general_categories)
+
     # Invoke the LLM with the prompt and log response for debugging
     response = llm.invoke(prompt)
     print("LLM Response:", response)  # Log the response to understand its format
@@ -61,7 +82,9 @@ def categorize_transactions(transaction_names, llm):
 
     # Convert formatted response into a DataFrame
     categories_df = pd.DataFrame({'Transaction vs category': formatted_lines})
-    categories_df[['Transaction', 'Category']] = categories_df['Transaction vs category'].str.split(' - ', expand=True)
+    # Split on the last separator so descriptions containing ' - ' stay intact
+    categories_df[['Transaction', 'Category']] = categories_df['Transaction vs category'].str.rsplit(' - ', n=1, expand=True)
+    categories_df['Category'] = categories_df['Category'].str.strip()
 
     # Ensure that only predefined categories are used; default to 'Miscellaneous' otherwise
     categories_df['Category'] = categories_df['Category'].apply(
@@ -69,31 +92,193 @@ def categorize_transactions(transaction_names, llm):
     )
 
     # Fill any remaining null categories with 'Miscellaneous'
-    categories_df['Category'].fillna('Miscellaneous', inplace=True)
+    categories_df['Category'] = categories_df['Category'].fillna('Miscellaneous')
 
     return categories_df[['Transaction', 'Category']]
 
-def process_transactions_in_batches(df, categories, batch_size=10):
-    """Batch process transactions for categorization."""
-    unique_transactions = df["Name / Description"].unique()
-    index_list = list(range(0, len(unique_transactions), batch_size)) + [len(unique_transactions)]
-    categories_df_all = pd.DataFrame()
+class LLMUnavailableError(RuntimeError):
+    """Raised when every attempt to call the LLM for a batch failed with an error (e.g. Ollama is down)."""
+
+def categorize_batch(batch, categories, retries=2, backoff=1.0):
+    """
+    Categorize one batch of descriptions, retrying with exponential backoff on errors or unusable responses.
+
+    Returns:
+    - tuple: (categories DataFrame or None, elapsed seconds, attempts made); None means the
+      LLM answered at least once but no response could be parsed, so the caller can split the batch.
 
-    # Loop through batches of transactions to categorize them
-    for i in range(len(index_list) - 1):
-        transaction_names = ','.join(unique_transactions[index_list[i]:index_list[i + 1]])
+    Raises:
+    - LLMUnavailableError: If every attempt failed to get a response at all. Splitting the batch
+      would not help then, so the caller should stop instead.
+    """
+    start = time.perf_counter()
+    transaction_names = '\n'.join(batch)
+    error = None
+    answered = False  # Whether any attempt got a reply, even an unparsable one
+    for attempt in range(1, retries + 2):
         try:
-            categories_df = categorize_transactions(transaction_names, llm)
-            # Only concatenate if the expected columns exist
+            categories_df = categorize_transactions(transaction_names, llm, categories)
+            answered = True
+            # Only accept the batch if the expected columns exist
             if not categories_df.empty and 'Transaction' in categories_df.columns:
-                categories_df_all = pd.concat([categories_df_all, categories_df[['Transaction', 'Category']]], ignore_index=True)
-            else:
-                print(f"Warning: Batch {i} did not return valid 'Transaction' and 'Category' columns.")
+                return categories_df[['Transaction', 'Category']], time.perf_counter() - start, attempt
+            print(f"Warning: attempt {attempt} did not return valid 'Transaction' and 'Category' columns.")
         except Exception as e:
-            print(f"Error during processing batch {i}: {e}")
-            continue  # Skip the batch if there's an error
+            print(f"Error on attempt {attempt}: {e}")
+            error = error or e
+        if attempt <= retries:
+            time.sleep(backoff * 2 ** (attempt - 1))
+    if not answered:
+        raise LLMUnavailableError(f"The LLM could not be reached: {error}") from error
+    return None, time.perf_counter() - start, retries + 1
+
+def process_transactions_in_batches(df, categories, batch_size=10, use_cache=True,
+                                    max_workers=DEFAULT_MAX_WORKERS, retries=2, timings=None,
+                                    context_tokens=DEFAULT_CONTEXT_TOKENS, use_fast_path=True):
+    """
+    Batch process transactions for categorization.
+
+    Collects every step of `iter_transactions_in_batches` and returns one 'Transaction'/'Category'
+    row per raw description, in the order the descriptions first appear in `df` regardless of which
+    request finished first.
+    """
+    frames = [
+        categories_df for categories_df, _, _ in iter_transactions_in_batches(
+            df, categories, batch_size=batch_size, use_cache=use_cache, max_workers=max_workers,
+            retries=retries, timings=timings, context_tokens=context_tokens, use_fast_path=use_fast_path,
+        )
+    ]
+    if not frames:
+        return pd.DataFrame(columns=["Transaction", "Category"])
+    categories_df_all = pd.concat(frames, ignore_index=True)
+
+    # Restore first-appearance order of the descriptions
+    first_seen = pd.Index(pd.unique(df["Name / Description"].dropna().astype(str)))
+    position = first_seen.get_indexer(categories_df_all["Transaction"])
+    return categories_df_all.iloc[position.argsort(kind="stable")].reset_index(drop=True)
+
+def iter_transactions_in_batches(df, categories, batch_size=10, use_cache=True,
+                                 max_workers=DEFAULT_MAX_WORKERS, retries=2, timings=None,
+                                 context_tokens=DEFAULT_CONTEXT_TOKENS, use_fast_path=True):
+    """
+    Categorize transactions, yielding results as soon as each step finishes.
+
+    Descriptions are first grouped by canonical key (see canonicalize.DescriptionIndex), so bank
+    variants of the same merchant are categorized once. Keys already present in the persistent
+    category cache (for the same category set and model) are answered from it, and those the local
+    fast path (pattern rules and the n-gram classifier in fast_classifier) is confident about are
+    assigned directly; only the remaining ones are sent to the LLM. Batches are dispatched
+    to up to `max_workers` concurrent requests. Their size starts at `batch_size` and is adapted by an
+    AdaptiveBatcher within the model's context budget. Descriptions missing from a response are
+    retried in halves; a single description whose answer still cannot be parsed falls back to
+    'Miscellaneous' (never written to the category cache). If the LLM cannot be reached at all,
+    no more batches are sent and LLMUnavailableError is raised; descriptions not yielded by then
+    stay uncategorized.
+
+    Parameters:
+    - timings (list, optional): If given, receives one dict per batch with its size, seconds,
+      attempts, parse rate and the number of descriptions given the 'Miscellaneous' fallback.
+
+    Yields:
+    - tuple: (DataFrame of 'Transaction'/'Category' for the raw descriptions resolved in this step,
+      number of canonical keys categorized so far, total number of canonical keys)
+    """
+    index = DescriptionIndex(df["Name / Description"])
+    key_of = dict(zip(index.representatives, index.keys))
+    model_name = getattr(llm, "model", "unknown")
+    general_categories = resolve_categories(categories)
+
+    # Categories are assigned per canonical key; the LLM sees each key's representative description
+    assigned = category_cache.get_many(index.keys, general_categories, model_name) if use_cache else {}
+    if use_fast_path:
+        fast = pre_classify([name for name, key in key_of.items() if key not in assigned], general_categories)
+        assigned.update({key_of[name]: category for name, category in fast.items()})
+    to_categorize = [name for name, key in key_of.items() if key not in assigned]
+    if assigned:
+        yield index.fan_out(assigned, only_assigned=True), len(assigned), len(index)
+
+    batcher = AdaptiveBatcher(
+        prompt_tokens=estimate_tokens(build_categorization_prompt("", general_categories)),
+        category_tokens=max(estimate_tokens(category) for category in general_categories),
+        context_tokens=context_tokens,
+        initial_size=batch_size,
+    )
+    pending = deque()  # Re-queued halves of failed batches, served before fresh descriptions
+    cursor = 0
+    batch_no = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        in_flight = {}
+        while cursor < len(to_categorize) or pending or in_flight:
+            # Keep every worker busy with the next batch
+            while len(in_flight) < max(1, max_workers) and (pending or cursor < len(to_categorize)):
+                if pending:
+                    batch = pending.popleft()
+                else:
+                    end = batcher.take(to_categorize, cursor)
+                    batch, cursor = to_categorize[cursor:end], end
+                future = executor.submit(categorize_batch, batch, general_categories, retries)
+                in_flight[future] = (batch_no, batch)
+                batch_no += 1
 
-    return categories_df_all
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, batch = in_flight.pop(future)
+                try:
+                    categories_df, elapsed, attempts = future.result()
+                except LLMUnavailableError:
+                    # Do not split or retry further: every other batch would fail the same way
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    raise
+                matched = match_batch_results(batch, categories_df) if categories_df is not None else {}
+                parse_rate = len(matched) / len(batch)
+                batcher.record(len(batch), elapsed, parse_rate)
+                print(f"Batch {i}: {len(batch)} transactions in {elapsed:.2f}s "
+                      f"({attempts} attempt(s), {parse_rate:.0%} parsed, next size {batcher.size})")
+                # Retry whatever the response did not cover instead of dropping it
+                unmatched = [name for name in batch if name not in matched]
+                fallback = len(batch) == 1 and bool(unmatched)
+                if timings is not None:
+                    timings.append({"batch": i, "size": len(batch), "seconds": elapsed,
+                                    "attempts": attempts, "parse_rate": parse_rate, "fallback": int(fallback)})
+
+                resolved = {key_of[name]: category for name, category in matched.items()}
+                if use_cache:
+                    category_cache.put_many(resolved, general_categories, model_name)
+
+                if fallback:
+                    # Only reached after parse failures; the guess is not cached so a later run asks again
+                    print(f"Warning: '{batch[0]}' could not be categorized; using 'Miscellaneous'.")
+                    resolved[key_of[batch[0]]] = "Miscellaneous"
+                elif len(unmatched) == len(batch):
+                    half = len(unmatched) // 2
+                    pending.appendleft(unmatched[half:])
+                    pending.appendleft(unmatched[:half])
+                elif unmatched:
+                    pending.appendleft(unmatched)
+
+                if resolved:
+                    assigned.update(resolved)
+                    yield index.fan_out(resolved, only_assigned=True), len(assigned), len(index)
+
+    if timings is not None:
+        timings.sort(key=lambda timing: timing["batch"])
+
+def match_batch_results(batch, categories_df):
+    """
+    Map the LLM's 'Transaction - Category' lines back onto the descriptions that were sent.
+
+    Lines whose transaction text does not correspond to any description in the batch are ignored,
+    so hallucinated or mangled names never end up in the cache.
+    """
+    requested = {normalize_description(name): name for name in batch}
+    names = categories_df['Transaction'].astype(str).str.replace(r'\d+\.\s+', '', regex=True)
+    matched = {}
+    for name, category in zip(names, categories_df['Category']):
+        original = requested.get(normalize_description(name))
+        if original is not None:
+            matched[original] = category
+    return matched
 
 def clean_transactions(df):
     """Clean the 'Transaction' column by removing unnecessary numbering or prefixes."""
@@ -112,28 +297,79 @@ def merge_categories(df, categories_df_all):
         merged_df = df.copy()  # Return original df if merge cannot be performed
     return merged_df
 
-def main():
-    general_categories = [
-        "Food & Dining", "Utilities & Bills", "Transportation", 
-        "Entertainment", "Health & Wellness", "Income", "Miscellaneous"
-    ]
-    
-    # Load the transaction data
-    df = load_data('transactions.csv')
-    
-    # Process transactions in batches and categorize them
-    categories_df_all = process_transactions_in_batches(df, general_categories)
-    
-    # Clean and replace empty strings with NaN, then drop rows where 'Category' is NaN
-    categories_df_all = clean_transactions(categories_df_all)
-    categories_df_all.replace('', pd.NA, inplace=True)  # Replace empty strings with NaN
-    categories_df_all.dropna(subset=['Category'], inplace=True)  # Drop rows with None or NaN in 'Category'
-    
-    # Merge categorized data with the original transaction data
-    df = merge_categories(df, categories_df_all)
-    
-    # Save the results to a new CSV file
-    save_data(df, 'categorized_transactions.csv')
+def fill_missing_categories(df, categories, known_df=None):
+    """
+    Categorize only the rows of `df` that have no category yet.
+
+    Rows that already carry a category (e.g. picked explicitly in the entry form) are left untouched.
+    Descriptions already categorized in `known_df` reuse that category, and only the rest are sent
+    through `process_transactions_in_batches`, so the LLM work scales with the number of new rows.
+    """
+    df = df.copy()
+    if "Category" not in df.columns:
+        df["Category"] = pd.NA
+    df["Category"] = df["Category"].replace("", pd.NA)
+    missing = df["Category"].isna()
+
+    # Reuse categories already assigned to the same description elsewhere in the dataset
+    if missing.any() and known_df is not None and "Category" in known_df.columns:
+        pending = df.loc[missing, "Name / Description"].unique()
+        known = known_df.loc[known_df["Name / Description"].isin(pending), ["Name / Description", "Category"]]
+        known = known.dropna(subset=["Category"]).drop_duplicates("Name / Description", keep="last")
+        lookup = known.set_index("Name / Description")["Category"]
+        df.loc[missing, "Category"] = df.loc[missing, "Name / Description"].map(lookup)
+        missing = df["Category"].isna()
+
+    # Only genuinely new descriptions reach the LLM
+    if missing.any():
+        try:
+            categories_df_all = clean_transactions(process_transactions_in_batches(df[missing], categories))
+        except LLMUnavailableError as e:
+            print(f"Warning: {e}; {int(missing.sum())} rows are left uncategorized.")
+            categories_df_all = pd.DataFrame(columns=["Transaction", "Category"])
+        if 'Transaction' in categories_df_all.columns and not categories_df_all.empty:
+            lookup = categories_df_all.drop_duplicates("Transaction", keep="last").set_index("Transaction")["Category"]
+            df.loc[missing, "Category"] = df.loc[missing, "Name / Description"].map(lookup)
+
+    if "Transaction" not in df.columns:
+        df["Transaction"] = df["Name / Description"].where(df["Category"].notna())
+    return df
+
+def append_transactions(categorized_df, new_rows, categories):
+    """
+    Append new transactions to an already categorized DataFrame without re-categorizing existing rows.
+
+    Parameters:
+    - categorized_df (DataFrame or None): The current categorized data.
+    - new_rows (DataFrame): Rows to add; a non-empty 'Category' marks a user-chosen category.
+    - categories (list): The categories the LLM may choose from.
+
+    Returns:
+    - DataFrame: The combined data with the same columns as `categorized_df`.
+    """
+    new_rows = fill_missing_categories(new_rows, categories, known_df=categorized_df)
+    if categorized_df is None:
+        return prepare_transactions(new_rows.reset_index(drop=True))
+    if is_prepared(categorized_df):
+        # Only the new rows are prepared; the existing ones keep their typed columns
+        combined = concat_prepared(categorized_df, new_rows)
+    else:
+        new_rows = prepare_transactions(new_rows)
+        new_rows = new_rows[[col for col in new_rows.columns if col in categorized_df.columns]]
+        combined = pd.concat([categorized_df, new_rows], ignore_index=True)
+    # Update the aggregates and budget trackers already built for the old rows with just the new ones
+    extend_aggregates(categorized_df, combined)
+    extend_budget_trackers(categorized_df, combined)
+    return combined
+
+def main(argv=None):
+    """
+    Command-line batch categorization: shards the unique descriptions over a process pool and the
+    configured Ollama endpoints/models, checkpoints finished batches so a rerun resumes, and writes
+    the merged result with `save_data`. Run with --help for the options.
+    """
+    import batch_categorize  # Imported here because batch_categorize builds on this module
+    batch_categorize.main(argv)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,175 @@
+# category_cache.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# Bump whenever the categorization prompt or the cache layout changes, so stale answers are discarded
+CACHE_VERSION = 4
+
+DEFAULT_CACHE_PATH = os.environ.get("MOOSE_CATEGORY_CACHE", "category_cache.sqlite")
+DEFAULT_MAX_ENTRIES = 200_000
+
+
+def normalize_description(description):
+    """
+    Normalizes a transaction description for use as a cache key.
+
+    Parameters:
+    - description (str): The raw "Name / Description" value.
+
+    Returns:
+    - str: The lowercased description with surrounding and repeated whitespace removed.
+    """
+    return re.sub(r"\s+", " ", str(description)).strip().casefold()
+
+
+def category_set_key(categories):
+    """
+    Builds a stable key for a set of categories, independent of their order.
+
+    Parameters:
+    - categories (list): The category names offered to the LLM.
+
+    Returns:
+    - str: A short hash identifying the category set.
+    """
+    joined = "\n".join(sorted(str(category).strip() for category in categories))
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()[:16]
+
+
+class CategoryCache:
+    """
+    Persistent SQLite cache mapping (normalized description, category set, model) to a category.
+
+    categorization stores canonical description keys (see canonicalize.canonicalize), so every
+    bank variant of a merchant shares one entry.
+
+    Entries are evicted least-recently-used once `max_entries` is exceeded, and optionally
+    expire after `max_age_days`. The whole cache is reset when CACHE_VERSION changes.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_age_days=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self._init_db()
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per operation keeps the cache safe across Streamlit threads and worker processes
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _init_db(self):
+        """Creates the cache table, dropping it first if it was written by a different CACHE_VERSION."""
+        with self._connect() as conn:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version != CACHE_VERSION:
+                conn.execute("DROP TABLE IF EXISTS categories")
+                conn.execute(f"PRAGMA user_version = {int(CACHE_VERSION)}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS categories ("
+                " description TEXT NOT NULL,"
+                " category_set TEXT NOT NULL,"
+                " model TEXT NOT NULL,"
+                " category TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " PRIMARY KEY (description, category_set, model))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_categories_last_used ON categories (last_used)")
+
+    def get_many(self, descriptions, categories, model):
+        """
+        Looks up cached categories for a list of descriptions.
+
+        Parameters:
+        - descriptions (iterable): Raw transaction descriptions.
+        - categories (list): The category set the result must have been produced with.
+        - model (str): The LLM model name the result must have been produced with.
+
+        Returns:
+        - dict: Mapping of raw description to cached category, for cache hits only.
+        """
+        by_key = {}
+        for description in descriptions:
+            by_key.setdefault(normalize_description(description), []).append(description)
+        if not by_key:
+            return {}
+
+        set_key = category_set_key(categories)
+        now = time.time()
+        min_created = now - self.max_age_days * 86400 if self.max_age_days else 0
+        keys = list(by_key)
+        hits = {}
+        with self._connect() as conn:
+            # Query in chunks to stay below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT description, category FROM categories "
+                    f"WHERE category_set = ? AND model = ? AND created_at >= ? AND description IN ({placeholders})",
+                    [set_key, model, min_created, *chunk],
+                ).fetchall()
+                for key, category in rows:
+                    for description in by_key[key]:
+                        hits[description] = category
+                conn.executemany(
+                    "UPDATE categories SET last_used = ? WHERE description = ? AND category_set = ? AND model = ?",
+                    [(now, key, set_key, model) for key, _ in rows],
+                )
+        return hits
+
+    def put_many(self, mapping, categories, model):
+        """
+        Stores description-to-category results and evicts the least recently used entries if needed.
+
+        Parameters:
+        - mapping (dict): Raw description to category.
+        - categories (list): The category set used to produce the results.
+        - model (str): The LLM model name used to produce the results.
+        """
+        if not mapping:
+            return
+        set_key = category_set_key(categories)
+        now = time.time()
+        rows = [
+            (normalize_description(description), set_key, model, category, now, now)
+            for description, category in mapping.items()
+            if isinstance(category, str) and category
+        ]
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO categories VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Drops expired entries and trims the table down to `max_entries`."""
+        if self.max_age_days:
+            conn.execute("DELETE FROM categories WHERE created_at < ?", (time.time() - self.max_age_days * 86400,))
+        (count,) = conn.execute("SELECT COUNT(*) FROM categories").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM categories WHERE rowid IN "
+                "(SELECT rowid FROM categories ORDER BY last_used ASC LIMIT ?)",
+                (excess,),
+            )
+
+    def clear(self):
+        """Removes every cached entry."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM categories")
+
+    def __len__(self):
+        with self._connect() as conn:
+            (count,) = conn.execute("SELECT COUNT(*) FROM categories").fetchone()
+        return count
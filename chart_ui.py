@@ -1,29 +1,64 @@
 import streamlit as st
 import charts
 
-def render_chart_grid(filtered_df):
+def lazy_expander(label, key, expanded=False):
+    """
+    An expander that reruns when it is opened or closed and reports it through `.open`, so its
+    content is only computed while it is showing. Streamlit versions without this get a plain
+    expander, which then always counts as open.
+    """
+    try:
+        return st.expander(label, expanded=expanded, key=key, on_change="rerun")
+    except TypeError:
+        return st.expander(label, expanded=expanded)
+
+def lazy_tabs(labels, key):
+    """Tabs that report the selected one through `.open`, like `lazy_expander` (all open on older Streamlit)."""
+    try:
+        return st.tabs(labels, key=key, on_change="rerun")
+    except TypeError:
+        return st.tabs(labels)
+
+def is_open(container):
+    """Whether a lazy tab or expander is showing; containers that do not track it count as open."""
+    return getattr(container, "open", None) is not False
+
+@st.fragment
+def render_chart_grid(filtered_df, categorized_df=None, date_range=(None, None)):
+    """
+    Shows the dashboard charts; figures come from the figure cache, so reruns do not rebuild them.
+
+    The cumulative balance is read from the running balance of the whole `categorized_df` (kept
+    up to date as rows are appended) over `date_range`, a [start, end) pair of timestamps.
+
+    Collapsed expanders build nothing. Opening one reruns only this grid (it is a fragment), and
+    its figure stays cached for later reruns.
+    """
     st.markdown("<h2>Financial Dashboard - Charts</h2>", unsafe_allow_html=True)
-    
-    # Create a 2x2 grid layout for the charts using st.columns
+
+    # Lay the charts out in two columns using st.columns
     col1, col2 = st.columns(2)
 
-    # First row of charts
-    with col1:
-        with st.expander("Time Series Line Chart", expanded=True):
-            charts.time_series_line_chart(filtered_df)
-    
-    with col2:
-        with st.expander("Stacked Area Chart"):
-            charts.stacked_area_chart(filtered_df)
-    
-    # Second row of charts
+    # (column, expander label, builder, builder parameters, expanded at first)
+    panels = [
+        (col1, "Time Series Line Chart", charts.time_series_line_chart, {}, True),
+        (col2, "Stacked Area Chart", charts.stacked_area_chart, {}, False),
+        (col1, "Category-Based Bar Chart", charts.category_bar_chart, {}, False),
+        (col2, "Expense Distribution (Pie Chart)", charts.pie_chart, {"type": "Expense"}, False),
+    ]
+    for column, label, builder, params, expanded in panels:
+        with column:
+            expander = lazy_expander(label, key=f"chart_{builder.__name__}", expanded=expanded)
+            if is_open(expander):
+                with expander:
+                    charts.render_chart(builder, filtered_df, **params)
+
     with col1:
-        with st.expander("Category-Based Bar Chart"):
-            charts.category_bar_chart(filtered_df)
-    
-    with col2:
-        with st.expander("Expense Distribution (Pie Chart)"):
-            charts.pie_chart(filtered_df, type="Expense")
-    
-    # Add more rows or columns as needed for additional charts
+        expander = lazy_expander("Cumulative Balance", key="chart_cumulative_sum_line_chart")
+        if is_open(expander):
+            with expander:
+                start, end = date_range
+                source = filtered_df if categorized_df is None else categorized_df
+                charts.render_chart(charts.cumulative_sum_line_chart, source, start=start, end=end)
 
+    # Add more rows or columns as needed for additional charts
@@ -2,26 +2,66 @@ import streamlit as st
 import plotly.express as px
 import pandas as pd
 
+import os
+
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+from schema import months, parse_dates
+from aggregates import get_cube, get_running_balance
+from downsampling import DEFAULT_POINT_BUDGET, downsample, render_mode
+from result_cache import LRUCache, fingerprint, freeze
+
+# Ranges up to this many days are plotted per day, longer ones per month
+DAILY_RANGE_DAYS = 92
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Built figures shared by every session, so reruns render them without running the builders again
+figure_cache = LRUCache(max_bytes=int(float(os.getenv("MOOSE_FIGURE_CACHE_MB", "32")) * 1024 * 1024), max_entries=256)
+
+
+def cached_figure(key, build):
+    """Returns the figure cached under `key`, building it with `build()` on a miss. Cached figures must not be modified."""
+    return figure_cache.get_or_compute(key, build)
+
+
+def chart_figure(builder, df, **params):
+    """
+    Returns the figure of a chart builder for `df`, cached by data fingerprint, chart and parameters.
+
+    Parameters:
+    - builder (function): A chart builder from this module, e.g. `pie_chart`.
+    - df (DataFrame or Series): The data it plots.
+    - params: Keyword arguments for the builder.
+    """
+    key = (fingerprint(df), builder.__name__, freeze(params))
+    return cached_figure(key, lambda: builder(df, **params))
+
+
+def render_chart(builder, df, **params):
+    """Displays the cached figure of a chart builder (see `chart_figure`)."""
+    st.plotly_chart(chart_figure(builder, df, **params), use_container_width=True)
 
 
 
-def time_series_line_chart(df):
+def time_series_line_chart(df, budget=DEFAULT_POINT_BUDGET):
     """
-    Displays a time series line chart showing cumulative income, expenses, and net savings over time.
+    Builds a time series line chart showing cumulative income, expenses, and net savings over time.
+
+    Each line is downsampled to its share of `budget` points, so the chart stays the same size
+    however many transactions are in the selected range.
     """
-    # Ensure Date column is in datetime format
-    df["Date"] = pd.to_datetime(df["Date"], errors='coerce')
-    df = df.dropna(subset=["Date"])
+    # Ensure Date column is in datetime format (a no-op for ingested data), without touching the caller's frame
+    df = df.assign(Date=parse_dates(df["Date"])).dropna(subset=["Date"])
 
     # Sort by date to ensure correct cumulative calculations
     df = df.sort_values("Date")
 
     # Separate income and expenses for cumulative calculations
-    df["Cumulative Income"] = df[df["Expense/Income"] == "Income"]["Amount (EUR)"].cumsum().fillna(method="ffill")
-    df["Cumulative Expense"] = df[df["Expense/Income"] == "Expense"]["Amount (EUR)"].cumsum().fillna(method="ffill")
+    df["Cumulative Income"] = df[df["Expense/Income"] == "Income"]["Amount (EUR)"].cumsum().ffill()
+    df["Cumulative Expense"] = df[df["Expense/Income"] == "Expense"]["Amount (EUR)"].cumsum().ffill()
 
     # Calculate net savings as the difference between cumulative income and expenses
     df["Net Savings"] = df["Cumulative Income"] - df["Cumulative Expense"]
@@ -34,82 +74,111 @@ def time_series_line_chart(df):
         var_name="Metric", 
         value_name="Value"  # Changed to "Value" to avoid conflicts
     )
+    df_melted = downsample(df_melted, "Date", "Value", budget, group="Metric")
 
     # Create the line chart
     fig = px.line(df_melted, x="Date", y="Value", color="Metric", 
-                  title="Cumulative Income, Expenses, and Net Savings Over Time")
+                  title="Cumulative Income, Expenses, and Net Savings Over Time",
+                  render_mode=render_mode(len(df_melted)))
 
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 def stacked_area_chart(df):
     """
-    Displays a stacked area chart to show cumulative income and expenses over time.
+    Builds a stacked area chart to show cumulative income and expenses over time.
+
+    Amounts are totalled per day for short ranges and per month (from the aggregate cube) for
+    longer ones, so the chart gets one point per period and type instead of one per transaction.
     """
-    fig = px.area(df, x="Date", y="Amount (EUR)", color="Expense/Income", 
+    dates = parse_dates(df["Date"])
+    if dates.max() - dates.min() <= pd.Timedelta(days=DAILY_RANGE_DAYS):
+        totals = df["Amount (EUR)"].groupby([dates.dt.floor("D"), df["Expense/Income"]], observed=True).sum()
+    else:
+        totals = get_cube(df).by(["Month", "Expense/Income"])
+        totals.index = totals.index.set_levels(totals.index.levels[0].to_timestamp(), level="Month")
+    totals = totals.rename("Amount (EUR)").rename_axis(["Date", "Expense/Income"]).reset_index()
+    fig = px.area(totals, x="Date", y="Amount (EUR)", color="Expense/Income", 
                   title="Cumulative Income and Expenses Over Time")
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 def category_bar_chart(df):
     """
-    Displays a bar chart comparing spending across categories.
+    Builds a bar chart comparing spending across categories.
     """
-    fig = px.bar(df, x="Category", y="Amount (EUR)", color="Expense/Income", 
+    # One bar segment per category and type, totalled from the aggregate cube
+    totals = get_cube(df).by(["Category", "Expense/Income"]).rename("Amount (EUR)").reset_index()
+    fig = px.bar(totals, x="Category", y="Amount (EUR)", color="Expense/Income", 
                  title="Spending and Income by Category")
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 def pie_chart(df, type="Expense"):
     """
-    Displays a pie chart showing the proportion of each category for expenses or income.
+    Builds a pie chart showing the proportion of each category for expenses or income.
     
     Parameters:
     - type (str): "Expense" or "Income" to filter by type.
     """
-    filtered_df = df[df["Expense/Income"] == type]
-    fig = px.pie(filtered_df, names="Category", values="Amount (EUR)", 
+    totals = get_cube(df).by("Category", type).rename("Amount (EUR)").reset_index()
+    fig = px.pie(totals, names="Category", values="Amount (EUR)", 
                  title=f"{type} Distribution by Category")
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-def bubble_chart(df):
+def bubble_chart(df, budget=DEFAULT_POINT_BUDGET):
     """
-    Displays a bubble chart of transactions, with size representing transaction amount.
+    Builds a bubble chart of transactions, with size representing transaction amount.
+
+    Above `budget` transactions, each category keeps the smallest and largest amounts per time
+    bucket (see `downsampling.downsample`).
     """
+    df = downsample(df, "Date", "Amount (EUR)", budget, group="Category")
     fig = px.scatter(df, x="Date", y="Amount (EUR)", size="Amount (EUR)", color="Category", 
-                     title="Bubble Chart of Transactions Over Time")
-    st.plotly_chart(fig, use_container_width=True)
+                     title="Bubble Chart of Transactions Over Time", render_mode=render_mode(len(df)))
+    return fig
 
 def monthly_breakdown_chart(df):
     """
-    Displays a grouped bar chart showing income and expenses by month.
+    Builds a grouped bar chart showing income and expenses by month.
     """
-    # Extract month and year for grouping
-    df["Month"] = pd.to_datetime(df["Date"]).dt.to_period("M")
-    monthly_df = df.groupby(["Month", "Expense/Income"])["Amount (EUR)"].sum().reset_index()
+    # Group by the precomputed month
+    monthly_df = (
+        df["Amount (EUR)"].groupby([months(df), df["Expense/Income"]], observed=True).sum().reset_index()
+    )
+    monthly_df["Month"] = monthly_df["Month"].astype(str)
     
     fig = px.bar(monthly_df, x="Month", y="Amount (EUR)", color="Expense/Income", barmode="group", 
                  title="Monthly Income and Expenses Breakdown")
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-def cumulative_sum_line_chart(df):
+def cumulative_sum_line_chart(df, budget=DEFAULT_POINT_BUDGET, start=None, end=None):
     """
-    Displays a cumulative sum line chart of spending and income over time.
+    Builds a cumulative sum line chart of spending and income over time, downsampled to `budget` points.
+
+    With `start` and/or `end`, only the balance dated in [start, end) is shown; it still includes
+    every earlier transaction, as a balance does.
     """
-    df = df.sort_values("Date")  # Ensure data is sorted by date
-    df["Cumulative Sum"] = df["Amount (EUR)"].cumsum()
-    fig = px.line(df, x="Date", y="Cumulative Sum", title="Cumulative Balance Over Time")
-    st.plotly_chart(fig, use_container_width=True)
+    # Memoized per dataset and kept up to date incrementally when rows are appended
+    running_balance = get_running_balance(df)
+    dates = running_balance.dates
+    first = 0 if start is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(start), "ns"), side="left"))
+    stop = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(pd.Timestamp(end), "ns"), side="left"))
+    balance = pd.DataFrame({"Date": dates[first:stop], "Cumulative Sum": running_balance.balance[first:stop]})
+    balance = downsample(balance, "Date", "Cumulative Sum", budget)
+    fig = px.line(balance, x="Date", y="Cumulative Sum", title="Cumulative Balance Over Time",
+                  render_mode=render_mode(len(balance)))
+    return fig
 
 def heatmap_transaction_frequency(df):
     """
-    Displays a heatmap for transaction frequency by day of the week and time of day.
+    Builds a heatmap for transaction frequency by day of the week and time of day.
     """
-    # Example of creating a heatmap by assuming 'Day' and 'Time' columns exist in df
-    df['Day'] = pd.to_datetime(df["Date"]).dt.day_name()
-    df['Time'] = pd.to_datetime(df["Date"]).dt.hour
-    frequency_df = df.groupby(['Day', 'Time']).size().reset_index(name="Frequency")
-    
-    fig = px.density_heatmap(frequency_df, x="Time", y="Day", z="Frequency", 
-                             title="Transaction Frequency by Day and Time", nbinsx=24)
-    st.plotly_chart(fig, use_container_width=True)
+    # Counts for every (weekday, hour) cell in a single bincount over weekday * 24 + hour
+    dates = parse_dates(df["Date"]).dropna()
+    cells = dates.dt.dayofweek.to_numpy() * 24 + dates.dt.hour.to_numpy()
+    frequency = np.bincount(cells, minlength=7 * 24).reshape(7, 24)
+
+    fig = go.Figure(go.Heatmap(z=frequency, x=list(range(24)), y=WEEKDAYS, colorbar=dict(title="Frequency")))
+    fig.update_layout(title="Transaction Frequency by Day and Time", xaxis_title="Time", yaxis_title="Day")
+    return fig
 
 
 
@@ -122,19 +191,27 @@ def heatmap_transaction_frequency(df):
 
 
 def plot_top_categories(result, title="Top Categories by Spending/Income"):
-    """Display a bar chart for the top categories by spending or income using Plotly."""
+    """Build a bar chart for the top categories by spending or income using Plotly."""
     fig = px.bar(result, x=result.index, y=result.values, title=title, labels={"x": "Category", "y": "Amount (EUR)"})
     fig.update_layout(xaxis_tickangle=-45)
     return fig
 
+def plot_budget_variance(result, title="Budget Variance by Category"):
+    """Build a bar chart of spending over (positive) or under (negative) budget per category using Plotly."""
+    fig = px.bar(result, x=result.index, y=result.values, title=title, labels={"x": "Category", "y": "Over Budget (EUR)"})
+    fig.update_layout(xaxis_tickangle=-45)
+    return fig
+
 def plot_monthly_growth(result, title="Monthly Growth Rate"):
-    """Display a line chart for monthly growth rates using Plotly."""
-    fig = px.line(result, x=result.index, y=result.values, title=title, labels={"x": "Month", "y": "Growth Rate (%)"})
+    """Build a line chart for monthly growth rates using Plotly."""
+    # Monthly periods are not JSON serializable; plot them as month labels
+    months_axis = result.index.astype(str) if isinstance(result.index, pd.PeriodIndex) else result.index
+    fig = px.line(result, x=months_axis, y=result.values, title=title, labels={"x": "Month", "y": "Growth Rate (%)"})
     fig.update_traces(mode="markers+lines")  # Adds markers to the line chart
     return fig
 
 def plot_yearly_summary(result):
-    """Display a grouped bar chart for yearly summary of income, expenses, and net savings using Plotly."""
+    """Build a grouped bar chart for yearly summary of income, expenses, and net savings using Plotly."""
     fig = go.Figure()
     for col in result.columns:
         fig.add_trace(go.Bar(
@@ -148,4 +225,11 @@ def plot_yearly_summary(result):
         xaxis_title="Year",
         yaxis_title="Amount (EUR)"
     )
-    return fig
\ No newline at end of file
+    return fig
+
+
+# Builders that plot the transactions themselves rather than the result of a metric
+TRANSACTION_CHARTS = {
+    time_series_line_chart, stacked_area_chart, category_bar_chart, pie_chart, bubble_chart,
+    monthly_breakdown_chart, cumulative_sum_line_chart, heatmap_transaction_frequency,
+}
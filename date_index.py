@@ -0,0 +1,212 @@
+# date_index.py
+
+import numpy as np
+import pandas as pd
+
+from result_cache import frame_memo
+from schema import parse_dates
+
+# Appended rows landing in more places than this are taken into a new sorted frame instead of spliced in
+MAX_SPLICES = 64
+
+
+class DateIndex:
+    """
+    Date-sorted copy of the transactions with per-(Expense/Income, Category) prefix sums.
+
+    Built once per dataset. A date range then resolves with `searchsorted`: `view` returns a
+    zero-copy slice of the sorted frame, and `totals` answers sums and counts per type and
+    category from prefix-sum differences, without touching the rows in the range. Rows without a
+    valid date are kept at the end of the sorted frame and fall outside every range.
+    """
+
+    def __init__(self, df):
+        dates = parse_dates(df["Date"]).to_numpy(dtype="datetime64[ns]")
+        valid = ~np.isnat(dates)
+        # Stable sort keeps same-timestamp rows in their original order; NaT rows go last
+        self.order = np.concatenate([np.flatnonzero(valid)[np.argsort(dates[valid], kind="stable")], np.flatnonzero(~valid)])
+        self.frame = df.iloc[self.order]
+        self.dates = dates[self.order[:valid.sum()]].view(np.int64)
+
+        codes, self.groups, amounts = _group_codes(self.frame.iloc[:len(self.dates)])
+        # Positions of each group's rows, still in date order thanks to the stable sort
+        by_group = np.argsort(codes, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(self.groups)))])
+        self.group_dates = []
+        self.group_amounts = []
+        self.group_sums = []
+        self.group_counts = []
+        for g in range(len(self.groups)):
+            positions = by_group[bounds[g]:bounds[g + 1]]
+            self.group_dates.append(self.dates[positions])
+            self.group_amounts.append(amounts[positions])
+            self.group_sums.append(_prefix_sums(amounts[positions]))
+            self.group_counts.append(_prefix_counts(amounts[positions]))
+
+    def extend(self, combined):
+        """
+        Index of `combined`, the indexed frame with rows appended after it.
+
+        The appended rows are merged into the date order with `searchsorted` instead of sorting
+        everything again, and only the groups they fall in get new prefix sums, from their first
+        new row on. Rows dated after the current end only extend the arrays. The result equals a
+        rebuild: existing rows stay ahead of appended rows with the same timestamp.
+
+        Parameters:
+        - combined (DataFrame): The indexed frame's rows followed by the appended ones.
+
+        Returns:
+        - DateIndex: The index of `combined` (this index is left unchanged).
+        """
+        previous = len(self.order)
+        dates = parse_dates(combined["Date"].iloc[previous:]).to_numpy(dtype="datetime64[ns]")
+        valid = ~np.isnat(dates)
+        appended = np.flatnonzero(valid)[np.argsort(dates[valid], kind="stable")]
+        new_dates = dates[appended].view(np.int64)
+        slots = np.searchsorted(self.dates, new_dates, side="right")
+
+        index = object.__new__(DateIndex)
+        index.order = np.concatenate([
+            np.insert(self.order[:len(self.dates)], slots, previous + appended),
+            self.order[len(self.dates):], previous + np.flatnonzero(~valid),
+        ])
+        index.frame = self._splice(combined, index.order, previous + appended, slots, previous + np.flatnonzero(~valid))
+        index.dates = np.insert(self.dates, slots, new_dates)
+
+        codes, groups, amounts = _group_codes(combined.iloc[previous + appended])
+        known = {_group_key(group): g for g, group in enumerate(self.groups)}
+        index.group_dates = list(self.group_dates)
+        index.group_amounts = list(self.group_amounts)
+        index.group_sums = list(self.group_sums)
+        index.group_counts = list(self.group_counts)
+        added = []
+        for code, group in enumerate(groups):
+            members = codes == code
+            g = known.get(_group_key(group))
+            if g is None:
+                added.append(code)
+                index.group_dates.append(new_dates[members])
+                index.group_amounts.append(amounts[members])
+                index.group_sums.append(_prefix_sums(amounts[members]))
+                index.group_counts.append(_prefix_counts(amounts[members]))
+                continue
+            at = np.searchsorted(self.group_dates[g], new_dates[members], side="right")
+            group_amounts = np.insert(self.group_amounts[g], at, amounts[members])
+            first = int(at[0])  # The new rows are in date order, so this is the earliest insertion
+            index.group_dates[g] = np.insert(self.group_dates[g], at, new_dates[members])
+            index.group_amounts[g] = group_amounts
+            index.group_sums[g] = np.concatenate([
+                self.group_sums[g][:first], _prefix_sums(group_amounts[first:], self.group_sums[g][first]),
+            ])
+            index.group_counts[g] = np.concatenate([
+                self.group_counts[g][:first], _prefix_counts(group_amounts[first:], self.group_counts[g][first]),
+            ])
+        index.groups = self.groups.append(groups[added]) if added else self.groups
+        return index
+
+    def _splice(self, combined, order, appended, slots, undated):
+        """
+        The sorted frame of `combined` (its rows in `order`): the rows at positions `appended`
+        inserted before `slots` of the sorted frame, and the `undated` ones added at the end.
+
+        When the new rows land in a few places, slices of the existing sorted frame are
+        concatenated around them, which copies far less than taking every row again.
+        """
+        cuts = np.unique(slots)
+        if len(cuts) > MAX_SPLICES:
+            return combined.iloc[order]
+        # Categoricals of `combined` may have gained categories; slices must match them to concatenate
+        changed = {column: combined[column].dtype for column in self.frame.columns if self.frame[column].dtype != combined[column].dtype}
+        base = self.frame.astype(changed) if changed else self.frame
+        pieces, start = [], 0
+        for cut in cuts:
+            rows = appended[np.searchsorted(slots, cut, side="left"):np.searchsorted(slots, cut, side="right")]
+            pieces += [base.iloc[start:cut], combined.iloc[rows]]
+            start = cut
+        pieces += [base.iloc[start:], combined.iloc[undated]]
+        return pd.concat(pieces)
+
+    def __len__(self):
+        return len(self.dates)
+
+    @staticmethod
+    def _timestamp(value):
+        return pd.Timestamp(value).as_unit("ns").value
+
+    def bounds(self, start, end):
+        """
+        Positions of the first and one-past-last row dated in [start, end) in the sorted frame.
+
+        Parameters:
+        - start, end: Anything `pd.Timestamp` accepts; None leaves that side open.
+
+        Returns:
+        - tuple: (first, stop) positions.
+        """
+        first = 0 if start is None else int(np.searchsorted(self.dates, self._timestamp(start), side="left"))
+        stop = len(self.dates) if end is None else int(np.searchsorted(self.dates, self._timestamp(end), side="left"))
+        return first, max(first, stop)
+
+    def view(self, start=None, end=None):
+        """Returns the rows dated in [start, end) as a slice of the sorted frame (no row copy)."""
+        first, stop = self.bounds(start, end)
+        return self.frame.iloc[first:stop]
+
+    def totals(self, start=None, end=None):
+        """
+        Sums and counts of the amounts dated in [start, end) per (Expense/Income, Category).
+
+        Returns:
+        - DataFrame: 'sum' and 'count' columns indexed by (Expense/Income, Category).
+        """
+        start_ns = None if start is None else self._timestamp(start)
+        end_ns = None if end is None else self._timestamp(end)
+        sums = np.zeros(len(self.groups))
+        counts = np.zeros(len(self.groups), dtype=np.int64)
+        for g, dates in enumerate(self.group_dates):
+            first = 0 if start_ns is None else np.searchsorted(dates, start_ns, side="left")
+            stop = len(dates) if end_ns is None else np.searchsorted(dates, end_ns, side="left")
+            if stop > first:
+                sums[g] = self.group_sums[g][stop] - self.group_sums[g][first]
+                counts[g] = self.group_counts[g][stop] - self.group_counts[g][first]
+        return pd.DataFrame({"sum": sums, "count": counts}, index=self.groups)
+
+
+def _group_codes(frame):
+    """
+    Group code per row of `frame` with the (Expense/Income, Category) groups, and the amounts.
+
+    Returns:
+    - tuple: (codes ndarray, groups MultiIndex, amounts ndarray with NaN where missing).
+    """
+    amounts = pd.to_numeric(frame["Amount (EUR)"], errors="coerce").to_numpy(dtype=np.float64)
+    categories = frame["Category"] if "Category" in frame.columns else pd.Series(np.nan, index=frame.index)
+    # Factorize each key on its own and combine the integer codes; factorizing tuples is much slower
+    type_codes, types = pd.factorize(frame["Expense/Income"], use_na_sentinel=False)
+    category_codes, category_values = pd.factorize(categories, use_na_sentinel=False)
+    codes, pairs = pd.factorize(type_codes.astype(np.int64) * len(category_values) + category_codes)
+    groups = pd.MultiIndex.from_arrays(
+        [types.take(pairs // max(len(category_values), 1)), category_values.take(pairs % max(len(category_values), 1))],
+        names=["Expense/Income", "Category"],
+    )
+    return codes, groups, amounts
+
+
+def _group_key(group):
+    """A group tuple usable as a dictionary key (missing values compare equal)."""
+    return tuple(None if pd.isna(value) else value for value in group)
+
+
+def _prefix_sums(amounts, start=0.0):
+    """Running sums of `amounts` (missing ones count as zero) starting from `start`, with `start` first."""
+    return np.cumsum(np.concatenate([[start], np.where(np.isnan(amounts), 0.0, amounts)]))
+
+
+def _prefix_counts(amounts, start=0):
+    """Running counts of the present `amounts` starting from `start`, with `start` first."""
+    return np.cumsum(np.concatenate([[start], ~np.isnan(amounts)]).astype(np.int64))
+
+
+def get_date_index(df):
+    """Returns the date index of `df`, building it on first use (memoized on the frame object)."""
+    return frame_memo(df, "date_index", lambda: DateIndex(df))
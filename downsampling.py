@@ -0,0 +1,130 @@
+# downsampling.py
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# Points a chart may send to the browser, over all of its traces
+DEFAULT_POINT_BUDGET = int(os.getenv("MOOSE_CHART_POINTS", "2000"))
+
+# Above this many points a trace is drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = int(os.getenv("MOOSE_WEBGL_THRESHOLD", "1000"))
+
+
+def _numeric(values):
+    """x values as float64, with datetimes as nanoseconds since the epoch."""
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        return values.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return values.astype(np.float64)
+
+
+def minmax_indices(x, y, budget):
+    """
+    Picks at most `budget` points keeping the lowest and highest value of every x bucket.
+
+    The x range is cut into budget / 2 equal-width buckets (one per pixel column at the target
+    width), so spikes and dips survive however many rows fall into a bucket. The first and last
+    points are always kept. Fully vectorized: one searchsorted and a few reduceat calls.
+
+    Parameters:
+    - x (ndarray): Sorted x values (numeric).
+    - y (ndarray): y values without NaN.
+    - budget (int): Maximum number of points.
+
+    Returns:
+    - ndarray: Sorted positions of the kept points.
+    """
+    n = len(x)
+    if n <= budget:
+        return np.arange(n)
+    buckets = max(1, (budget - 2) // 2)
+    edges = np.linspace(x[0], x[-1], buckets + 1)[1:-1]
+    starts = np.unique(np.concatenate([[0], np.searchsorted(x, edges, side="left")]))
+    starts = starts[starts < n]
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+    positions = np.arange(n)
+    lowest = np.minimum.reduceat(y, starts)
+    highest = np.maximum.reduceat(y, starts)
+    # First position holding each bucket's extreme
+    first_low = np.minimum.reduceat(np.where(y == lowest[segment], positions, n), starts)
+    first_high = np.minimum.reduceat(np.where(y == highest[segment], positions, n), starts)
+    return np.unique(np.concatenate([[0, n - 1], first_low, first_high]))
+
+
+def lttb_indices(x, y, budget):
+    """
+    Picks `budget` points with Largest-Triangle-Three-Buckets.
+
+    Each bucket keeps the point forming the largest triangle with the point kept from the previous
+    bucket and the mean of the next bucket, which follows the visual shape of a line closely. The
+    buckets are visited in order (the choice depends on the previous one), with vectorized work
+    inside each bucket.
+
+    Returns:
+    - ndarray: Sorted positions of the kept points.
+    """
+    n = len(x)
+    if n <= budget or budget < 3:
+        return np.arange(n) if n <= budget else np.array([0, n - 1])
+    edges = np.linspace(1, n - 1, budget - 1).astype(np.int64)
+    kept = np.empty(budget, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(budget - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        following = slice(end, edges[bucket + 2]) if bucket + 2 < len(edges) else slice(n - 1, n)
+        mean_x, mean_y = x[following].mean(), y[following].mean()
+        area = np.abs(
+            (x[previous] - mean_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (mean_y - y[previous])
+        )
+        previous = start + int(np.argmax(area)) if end > start else start
+        kept[bucket + 1] = previous
+    return np.unique(kept)
+
+
+def downsample(frame, x, y, budget=DEFAULT_POINT_BUDGET, method="minmax", group=None):
+    """
+    Reduces a frame to at most `budget` rows that keep the shape of its `y` over `x`.
+
+    Frames already within the budget are returned unchanged. With `group`, every group (one
+    trace) gets a share of the budget proportional to its size, and at least a few points.
+
+    Parameters:
+    - frame (DataFrame): The points to plot.
+    - x (str): Column on the horizontal axis (dates or numbers).
+    - y (str): Column on the vertical axis.
+    - budget (int): Maximum number of rows returned.
+    - method (str): "minmax" (extremes per x bucket) or "lttb" (Largest-Triangle-Three-Buckets).
+    - group (str): Column that splits the rows into traces, e.g. 'Category'.
+
+    Returns:
+    - DataFrame: The kept rows, ordered by `x`.
+    """
+    if len(frame) <= budget:
+        return frame
+    pick = minmax_indices if method == "minmax" else lttb_indices
+    frame = frame[frame[x].notna() & frame[y].notna()]
+    order = np.argsort(_numeric(frame[x]), kind="stable")
+    frame = frame.iloc[order]
+    if group is None:
+        return frame.iloc[pick(_numeric(frame[x]), frame[y].to_numpy(dtype=np.float64), budget)]
+
+    # Rows without a group value form a trace of their own, as they do in Plotly
+    codes, _ = pd.factorize(frame[group], use_na_sentinel=False)
+    sizes = np.bincount(codes)
+    shares = np.maximum(4, (budget * sizes / max(sizes.sum(), 1)).astype(np.int64))
+    x_values = _numeric(frame[x])
+    y_values = frame[y].to_numpy(dtype=np.float64)
+    kept = []
+    for code, share in enumerate(shares):
+        members = np.flatnonzero(codes == code)
+        kept.append(members[pick(x_values[members], y_values[members], share)])
+    return frame.iloc[np.sort(np.concatenate(kept))] if kept else frame.iloc[:0]
+
+
+def render_mode(points):
+    """Plotly Express `render_mode` for a chart sending `points` points: WebGL above WEBGL_THRESHOLD."""
+    return "webgl" if points > WEBGL_THRESHOLD else "svg"
@@ -3,13 +3,18 @@
 import streamlit as st
 import pandas as pd
 import categorization  # Import categorization functions
+import budgets
+
+# Selecting this option leaves the category to the LLM instead of the user
+AUTO_CATEGORY = "Auto-categorize"
 
 def render_expense_entry_form(categories):
     """
     Renders a form in the sidebar to allow the user to manually add new expenses or income.
     
     Parameters:
-    - categories (list): A list of category names that the user can select from.
+    - categories (list): A list of category names that the user can select from. Only entries
+      submitted with the AUTO_CATEGORY option are sent to the LLM.
     """
     st.sidebar.markdown("### Add New Expense or Income")
 
@@ -17,7 +22,7 @@ def render_expense_entry_form(categories):
     with st.sidebar.form(key="expense_entry_form"):
         date = st.date_input("Date")
         description = st.text_input("Description")
-        category = st.selectbox("Category", categories)  # Use provided categories
+        category = st.selectbox("Category", [AUTO_CATEGORY] + list(categories))  # Use provided categories
         amount = st.number_input("Amount (€)", min_value=0.0, step=1.0)
         expense_type = st.selectbox("Type", ["Expense", "Income"])
         
@@ -32,20 +37,12 @@ def render_expense_entry_form(categories):
             "Name / Description": [description],
             "Expense/Income": [expense_type],
             "Amount (EUR)": [amount],
-            "Category": [category]
+            "Category": [pd.NA if category == AUTO_CATEGORY else category]
         })
         
-        # Append to the session-stored DataFrame if it exists
-        if "categorized_data" in st.session_state:
-            updated_df = pd.concat([st.session_state["categorized_data"], new_entry], ignore_index=True)
-        else:
-            updated_df = new_entry
-        
-        # Re-categorize the updated data (use batch processing if needed)
-        user_categories = categories  # Use the categories passed in the function
-        categories_df_all = categorization.process_transactions_in_batches(updated_df, user_categories)
-        categories_df_all = categorization.clean_transactions(categories_df_all)
-        categorized_df = categorization.merge_categories(updated_df, categories_df_all)
+        # Append to the session-stored data, categorizing only the new entry if needed
+        existing_df = st.session_state.get("categorized_data")
+        categorized_df = categorization.append_transactions(existing_df, new_entry, categories)
         
         # Update session state with the newly categorized data
         st.session_state["categorized_data"] = categorized_df
@@ -53,3 +50,7 @@ def render_expense_entry_form(categories):
 
         # Display success message
         st.sidebar.success("Entry added successfully!")
+        for alert in budgets.appended_alerts(categorized_df).itertuples():
+            st.sidebar.warning(budgets.alert_message(alert))
+        if pd.isna(categorized_df["Category"].iloc[-1]):
+            st.sidebar.warning("The LLM could not be reached, so the entry was left uncategorized.")
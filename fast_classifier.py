@@ -0,0 +1,195 @@
+# fast_classifier.py
+
+import json
+import os
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Labelled history used to train the local classifier; set MOOSE_TRAINING_DATA to use another file
+TRAINING_DATA_PATH = os.environ.get("MOOSE_TRAINING_DATA", "categorized_transactions.csv")
+
+# Optional JSON file of [pattern, category] pairs that extends DEFAULT_RULES
+RULES_PATH = os.environ.get("MOOSE_CATEGORY_RULES", "category_rules.json")
+
+# Similarity a nearest neighbour needs before its category is trusted without asking the LLM
+DEFAULT_CONFIDENCE_THRESHOLD = 0.8
+
+# Pattern rules for the default categories; rules for categories the user did not configure are skipped
+DEFAULT_RULES = [
+    (r"\b(?:electricity|water|sewer|internet|phone|natural gas|trash)\b.*\bbill\b|\brent\b|\bmortgage\b", "Utilities & Bills"),
+    (r"\bgrocer|\brestaurant\b|\bcoffee\b|\bcaf[eé]\b|\btakeout\b|\bmeal delivery\b", "Food & Dining"),
+    (r"\buber\b|\btaxi\b|\bparking\b|\bcar fuel\b|\bgas station\b|\btoll\b|\bflight\b", "Transportation"),
+    (r"\bnetflix\b|\bspotify\b|\bmovie\b|\bconcert\b|\btheater\b|\bstreaming\b|\bvideo game\b", "Entertainment"),
+    (r"\bpharmacy\b|\bdoctor\b|\bdental\b|\bgym\b|\byoga\b|\bmedical\b|\bprescription\b|\btherapist\b", "Health & Wellness"),
+    (r"\bsalary\b|\bpayroll\b|\bfreelance\b|\bconsulting income\b|\binvestment income\b|\bside gig\b", "Income"),
+]
+
+
+def load_rules(path=RULES_PATH):
+    """
+    Loads user-defined rules from a JSON file of [pattern, category] pairs.
+
+    Parameters:
+    - path (str): Path to the rules file.
+
+    Returns:
+    - list: (pattern, category) tuples; empty if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [(pattern, category) for pattern, category in json.load(f)]
+
+
+class RuleMatcher:
+    """
+    Matches every description against all rules at once.
+
+    The rules are compiled into a single alternation of named groups, so one vectorized
+    `str.extract` over the description column finds the matching rule for every row.
+    """
+
+    def __init__(self, rules, categories=None):
+        if categories is not None:
+            rules = [(pattern, category) for pattern, category in rules if category in categories]
+        self.categories = [category for _, category in rules]
+        self.pattern = "|".join(f"(?P<rule{i}>(?:{pattern}))" for i, (pattern, _) in enumerate(rules))
+
+    def match(self, descriptions):
+        """
+        Parameters:
+        - descriptions (Series): Descriptions to classify.
+
+        Returns:
+        - Series: The matched category per description, or NaN where no rule applies.
+        """
+        if not self.categories:
+            return pd.Series(np.nan, index=descriptions.index, dtype=object)
+        groups = descriptions.astype(str).str.extract(self.pattern, flags=re.IGNORECASE)
+        group_names = [f"rule{i}" for i in range(len(self.categories))]
+        matched = groups[group_names].notna().to_numpy()
+        first_rule = matched.argmax(axis=1)
+        result = np.array(self.categories, dtype=object)[first_rule]
+        return pd.Series(np.where(matched.any(axis=1), result, np.nan), index=descriptions.index, dtype=object)
+
+
+def _ngrams(text, n):
+    text = " " + re.sub(r"\s+", " ", str(text).casefold()).strip() + " "
+    return [text[i:i + n] for i in range(max(1, len(text) - n + 1))]
+
+
+class NgramClassifier:
+    """
+    Nearest-neighbour classifier over TF-IDF weighted character n-grams.
+
+    n-grams are hashed into a fixed number of buckets and each description becomes an L2-normalized
+    vector; the confidence of a prediction is the cosine similarity to its closest labelled description.
+    """
+
+    def __init__(self, n=3, buckets=2 ** 12):
+        self.n = n
+        self.buckets = buckets
+        self.idf = None
+        self.vectors = None
+        self.labels = None
+
+    def _counts(self, descriptions):
+        counts = np.zeros((len(descriptions), self.buckets), dtype=np.float32)
+        for row, description in enumerate(descriptions):
+            # crc32 keeps bucket assignment stable across processes, unlike hash()
+            buckets = [zlib.crc32(gram.encode("utf-8")) % self.buckets for gram in _ngrams(description, self.n)]
+            np.add.at(counts[row], buckets, 1)
+        return counts
+
+    def _vectorize(self, descriptions):
+        vectors = self._counts(descriptions) * self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def fit(self, descriptions, labels):
+        """
+        Trains on labelled descriptions; each distinct description keeps its most frequent label.
+
+        Parameters:
+        - descriptions (Series): Transaction descriptions.
+        - labels (Series): Their categories.
+        """
+        labelled = pd.DataFrame({"description": descriptions.astype(str), "label": labels}).dropna()
+        majority = labelled.groupby("description")["label"].agg(lambda values: values.value_counts().index[0])
+        counts = self._counts(majority.index)
+        document_frequency = (counts > 0).sum(axis=0)
+        self.idf = (np.log((1 + len(majority)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.vectors = self._vectorize(majority.index)
+        self.labels = majority.to_numpy(dtype=object)
+        return self
+
+    def predict(self, descriptions, chunk_size=2048):
+        """
+        Parameters:
+        - descriptions (list): Descriptions to classify.
+
+        Returns:
+        - tuple: (array of predicted labels, array of confidences in [0, 1])
+        """
+        labels = np.empty(len(descriptions), dtype=object)
+        confidence = np.zeros(len(descriptions), dtype=np.float32)
+        if self.vectors is None or len(self.labels) == 0:
+            return labels, confidence
+        # Score in chunks to bound the size of the similarity matrix
+        for start in range(0, len(descriptions), chunk_size):
+            similarity = self._vectorize(descriptions[start:start + chunk_size]) @ self.vectors.T
+            nearest = similarity.argmax(axis=1)
+            labels[start:start + chunk_size] = self.labels[nearest]
+            confidence[start:start + chunk_size] = similarity[np.arange(len(nearest)), nearest]
+        return labels, confidence
+
+
+_classifier = None
+
+
+def get_classifier(path=TRAINING_DATA_PATH):
+    """Returns the n-gram classifier trained on `path`, training it on first use; None if there is no data."""
+    global _classifier
+    if _classifier is None:
+        if not os.path.exists(path):
+            return None
+        training = pd.read_csv(path, usecols=["Name / Description", "Category"])
+        _classifier = NgramClassifier().fit(training["Name / Description"], training["Category"])
+    return _classifier
+
+
+def pre_classify(descriptions, categories, threshold=DEFAULT_CONFIDENCE_THRESHOLD, rules=None):
+    """
+    Classifies descriptions locally, returning only the confident answers.
+
+    Rules are tried first; the n-gram classifier handles the rest, and its prediction is kept only
+    when the similarity reaches `threshold` and the predicted category is one of `categories`.
+
+    Parameters:
+    - descriptions (list): Unique descriptions to classify.
+    - categories (list): The allowed categories.
+    - threshold (float): Minimum nearest-neighbour similarity to accept a prediction.
+    - rules (list, optional): (pattern, category) pairs; defaults to DEFAULT_RULES plus load_rules().
+
+    Returns:
+    - dict: Mapping of description to category for the rows that need no LLM call.
+    """
+    if len(descriptions) == 0:
+        return {}
+    if rules is None:
+        rules = DEFAULT_RULES + load_rules()
+    series = pd.Series(list(descriptions), dtype=object)
+    assigned = RuleMatcher(rules, categories).match(series)
+
+    classifier = get_classifier()
+    remaining = assigned.isna()
+    if classifier is not None and remaining.any():
+        labels, confidence = classifier.predict(series[remaining].tolist())
+        confident = (confidence >= threshold) & pd.Series(labels).isin(categories).to_numpy()
+        assigned.loc[remaining[remaining].index[confident]] = labels[confident]
+
+    assigned = assigned.dropna()
+    return dict(zip(series[assigned.index], assigned))
@@ -1,5 +1,6 @@
 # layout.py
 
+import time
 import streamlit as st
 import splash_screen
 import loading_screen
@@ -8,10 +9,19 @@ import chat_ui
 import chart_ui
 import expense_entry_form  # Import the form module
 import llm_chat  # Import the llm_chat module
+import metrics
+import budgets
+import transaction_table
 from utils import format_currency
 import pandas as pd
+import schema
+from date_index import get_date_index
 from create_goal_ui import display_goal_creation_ui
 
+# How often the in-progress preview is redrawn, and how many of the latest rows it shows
+PREVIEW_REFRESH_SECONDS = 1.0
+PREVIEW_ROWS = 200
+
 # Define the default categories (or get them from the model or settings)
 default_categories = ["Food & Dining", "Utilities & Bills", "Transportation", 
                       "Entertainment", "Health & Wellness", "Income", "Miscellaneous"]
@@ -34,16 +44,74 @@ def render_sidebar():
 
 
 def process_and_store_data(uploaded_file, user_categories):
-    """Processes and categorizes data once, then stores it in session state."""
+    """
+    Processes and categorizes data once, then stores it in session state.
+
+    The CSV is read in chunks and categorized batch by batch; a progress bar and a preview of the
+    partial results are refreshed as batches arrive, so the first insights appear long before the
+    last batch is done.
+    """
     if "categorized_data" not in st.session_state:
-        # Use loading screen while processing
-        df = loading_screen.process_data(uploaded_file)
-        categories_df_all = categorization.process_transactions_in_batches(df, user_categories)
-        categories_df_all = categorization.clean_transactions(categories_df_all)
-        categorized_df = categorization.merge_categories(df, categories_df_all)
+        progress = st.progress(0.0, text="Categorizing transactions...")
+        preview = st.empty()
+        chunks = []
+        known = {}  # Description -> category for everything categorized so far
+        last_refresh = 0.0
+        read_before = 0.0
+        llm_error = None
+
+        for chunk, read_after in loading_screen.iter_data(uploaded_file):
+            chunks.append(chunk)
+            if llm_error is not None:
+                # The LLM is unreachable: keep loading the data, but leave the rest uncategorized
+                continue
+            # Descriptions already categorized in earlier chunks are not sent again
+            new_rows = chunk[~chunk["Name / Description"].isin(list(known))]
+            try:
+                for categories_df, done, total in categorization.iter_transactions_in_batches(new_rows, user_categories):
+                    known.update(zip(categories_df["Transaction"], categories_df["Category"]))
+                    chunk_fraction = done / total if total else 1.0
+                    if read_after is None:
+                        overall = chunk_fraction
+                    else:
+                        overall = read_before + (read_after - read_before) * chunk_fraction
+                    progress.progress(min(overall, 1.0), text=f"Categorized {len(known):,} descriptions...")
+
+                    # Throttle preview refreshes so re-rendering does not dominate categorization time
+                    if time.monotonic() - last_refresh > PREVIEW_REFRESH_SECONDS:
+                        render_partial_results(preview, pd.concat(chunks, ignore_index=True), known)
+                        last_refresh = time.monotonic()
+            except categorization.LLMUnavailableError as e:
+                llm_error = e
+            read_before = read_after if read_after is not None else read_before
+
+        df = pd.concat(chunks, ignore_index=True)
+        categories_df_all = pd.DataFrame({"Transaction": list(known.keys()), "Category": list(known.values())})
+        categorized_df = schema.prepare_transactions(categorization.merge_categories(df, categories_df_all))
         
         # Store the categorized data in session state
         st.session_state["categorized_data"] = categorized_df
+        progress.empty()
+        preview.empty()
+        if llm_error is not None:
+            uncategorized = int(categorized_df["Category"].isna().sum())
+            st.error(f"{llm_error}. {uncategorized:,} transactions were left uncategorized.")
+
+
+def render_partial_results(placeholder, df, known):
+    """Shows running totals and the most recent categorized rows while categorization is still in progress."""
+    partial = df.assign(Category=df["Name / Description"].map(known))
+    done = partial[partial["Category"].notna()]
+    with placeholder.container():
+        st.subheader("Categorized Transactions (in progress)")
+        total_expense = done.loc[done["Expense/Income"] == "Expense", "Amount (EUR)"].sum()
+        total_income = done.loc[done["Expense/Income"] == "Income", "Amount (EUR)"].sum()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Expenses (€)", format_currency(total_expense))
+        col2.metric("Total Income (€)", format_currency(total_income))
+        col3.metric("Net Savings (€)", format_currency(total_income - total_expense))
+        st.bar_chart(done[done["Expense/Income"] == "Expense"].groupby("Category")["Amount (EUR)"].sum())
+        st.dataframe(done.tail(PREVIEW_ROWS))
 
 
 def render_main_content(uploaded_file, user_categories):
@@ -59,15 +127,16 @@ def render_main_content(uploaded_file, user_categories):
         
         categorized_df = st.session_state["categorized_data"]  # Access the stored data
 
-        # Create tabs for different sections
-        tabs = st.tabs(["Categorized Transactions", "Financial Goals", "Dashboard", "Chat with Moose"])
+        # Create tabs for different sections; only the selected one does its work
+        tabs = chart_ui.lazy_tabs(["Categorized Transactions", "Financial Goals", "Dashboard", "Chat with Moose"], key="main_tabs")
 
         # Categorized Transactions Tab
         with tabs[0]:
             st.subheader("Categorized Transactions")
-            # Date range picker
-            min_date = pd.to_datetime(categorized_df["Date"]).min()
-            max_date = pd.to_datetime(categorized_df["Date"]).max()
+            # The date range drives every tab, so its picker runs even while another tab is selected
+            # Date range picker ('Date' is already datetime64, parsed once at ingestion)
+            min_date = categorized_df["Date"].min()
+            max_date = categorized_df["Date"].max()
             
             start_date, end_date = st.date_input(
                 "Date Range",
@@ -76,45 +145,74 @@ def render_main_content(uploaded_file, user_categories):
                 max_value=max_date
             )
 
-            # Filter data based on selected date range
-            filtered_df = categorized_df[
-                (pd.to_datetime(categorized_df["Date"]) >= pd.to_datetime(start_date)) & 
-                (pd.to_datetime(categorized_df["Date"]) <= pd.to_datetime(end_date))
-            ]
+            # Filter data based on selected date range, including the whole end day
+            # Cached per range, so reruns get the same frame back and its metrics stay memoized
+            filtered_df = metrics.filter_date_range(categorized_df, start_date, end_date)
+            date_range = (pd.Timestamp(start_date), pd.Timestamp(end_date) + pd.Timedelta(days=1))
+
+            # Range totals come from the date index's prefix sums, not from the rows in the range
+            range_totals = get_date_index(categorized_df).totals(*date_range).groupby(
+                level="Expense/Income", observed=True
+            ).sum()
+            range_expense = range_totals["sum"].get("Expense", 0.0)
+            range_income = range_totals["sum"].get("Income", 0.0)
+            st.caption(
+                f"{int(range_totals['count'].sum())} transactions · Expenses {format_currency(range_expense)} · "
+                f"Income {format_currency(range_income)}"
+            )
 
-            st.write(filtered_df)  # Display the filtered categorized transactions
+            if chart_ui.is_open(tabs[0]):
+                # Paginated, with search, filters and sorting done on the server; only one page is sent
+                transaction_table.render_transaction_table(filtered_df)
 
         # Financial Goals Tab
         with tabs[1]:
-            st.subheader("Financial Goals")
-            display_goal_creation_ui()  # Display goal creation and tracking UI
+            if chart_ui.is_open(tabs[1]):
+                st.subheader("Financial Goals")
+                display_goal_creation_ui()  # Display goal creation and tracking UI
 
         # Financial Dashboard Tab
         with tabs[2]:
-            st.subheader("Overall Summary")
-            total_expense = categorized_df[categorized_df['Expense/Income'] == "Expense"]['Amount (EUR)'].sum()
-            total_income = categorized_df[categorized_df['Expense/Income'] == "Income"]['Amount (EUR)'].sum()
-            net_savings = total_income - total_expense
-
-            st.metric("Total Expenses (€)", format_currency(total_expense))
-            st.metric("Total Income (€)", format_currency(total_income))
-            st.metric("Net Savings (€)", format_currency(net_savings))
-
-            # Display charts using the filtered data
-            st.header("Charts")
-            chart_ui.render_chart_grid(filtered_df)
+            if chart_ui.is_open(tabs[2]):
+                render_dashboard(categorized_df, filtered_df, date_range)
 
         # Chat with Moose Tab
         with tabs[3]:
-            st.header("Chat with Moose")
-            # Use llm_chat's render_chat_ui function to handle the chat and mic functionalities
-            llm_chat.render_chat_ui(filtered_df)
+            if chart_ui.is_open(tabs[3]):
+                st.header("Chat with Moose")
+                # Use llm_chat's render_chat_ui function to handle the chat and mic functionalities
+                llm_chat.render_chat_ui(filtered_df)
 
     else:
         # Show splash screen if no file is uploaded
         splash_screen.render_splash_screen()
 
 
+def render_dashboard(categorized_df, filtered_df, date_range=(None, None)):
+    """The Dashboard tab: overall summary metrics and the chart grid."""
+    st.subheader("Overall Summary")
+    # Evaluated together in one pass and memoized per dataset, so widget reruns reuse the results
+    summary = metrics.evaluate(categorized_df, ["total expenses", "total income", "net savings"])
+    total_expense = summary["total expenses"]
+    total_income = summary["total income"]
+    net_savings = summary["net savings"]
+
+    st.metric("Total Expenses (€)", format_currency(total_expense))
+    st.metric("Total Income (€)", format_currency(total_income))
+    st.metric("Net Savings (€)", format_currency(net_savings))
+
+    # Budgets at or over an alert threshold this month (the tracker is memoized on the dataset)
+    alerts = budgets.current_alerts(categorized_df)
+    if not alerts.empty:
+        st.subheader("Budget Alerts")
+        for alert in alerts.itertuples():
+            (st.error if alert.Utilization >= 1 else st.warning)(budgets.alert_message(alert))
+
+    # Display charts using the filtered data
+    st.header("Charts")
+    chart_ui.render_chart_grid(filtered_df, categorized_df, date_range)
+
+
 def render_layout():
     """Renders the entire layout including the sidebar and main content."""
     uploaded_file, user_categories = render_sidebar()
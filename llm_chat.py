@@ -311,6 +311,7 @@
 
 # llm_chat.py
 
+import re
 import pandas as pd
 import whisper
 import streamlit as st
@@ -318,6 +319,7 @@ from streamlit_webrtc import webrtc_streamer, AudioProcessorBase
 from model import initialize_llm
 import metrics
 from goal_manager import get_goals
+from budgets import get_budgets, set_budget
 
 # Initialize LLM instance and Whisper model
 llm = initialize_llm()
@@ -348,6 +350,28 @@ def generate_goal_prompt(goal):
         "Please provide suggestions on how I can reach this goal faster and any steps I can take to improve my finances."
     )
 
+def parse_budgets(user_question, df):
+    """Reads 'category amount' pairs such as 'Food & Dining 400' or 'transportation: €150' from a question."""
+    categories = df["Category"].dropna().unique() if "Category" in df.columns else []
+    budgets = {}
+    for category in categories:
+        match = re.search(rf"{re.escape(str(category))}\s*[:=]?\s*€?\s*(\d+(?:[.,]\d+)?)", user_question, re.IGNORECASE)
+        if match:
+            budgets[category] = float(match.group(1).replace(",", "."))
+    return budgets
+
+def budget_arguments(user_question, df):
+    """
+    Keyword arguments for the budget commands: the budgets named in the question (remembered for
+    later questions) on top of the saved ones, with rollover when the question asks for it.
+    """
+    for category, amount in parse_budgets(user_question, df).items():
+        set_budget(category, amount)
+    budgets = get_budgets()
+    if not budgets:
+        return None
+    return {"budget_dict": budgets, "rollover": "full" if "rollover" in user_question.lower() else "none"}
+
 def generate_chat_response(user_question, df):
     keyword_to_command = {
         "total expenses": "total expenses",
@@ -358,6 +382,7 @@ def generate_chat_response(user_question, df):
         "monthly growth rate": "monthly growth rate",
         "yearly summary": "yearly summary",
         "budget variance": "budget variance",
+        "budget status": "budget status",
         "savings rate": "savings rate",
         "income to expense ratio": "income to expense ratio",
         "spending consistency": "spending consistency",
@@ -387,10 +412,26 @@ def generate_chat_response(user_question, df):
 
     for keyword, command in keyword_to_command.items():
         if keyword in user_question.lower():
-            result, plot_func = metrics.execute_command(command, df)
+            kwargs = {}
+            if command in ("budget variance", "budget status"):
+                kwargs = budget_arguments(user_question, df)
+                if kwargs is None:
+                    return "No budgets found. Please give one, e.g. 'budget variance Food & Dining 400'."
+            result, plot_func = metrics.execute_command(command, df, **kwargs)
             if isinstance(result, pd.Series):
                 result_str = "\n".join([f"{index}: €{value:,.2f}" for index, value in result.items()])
                 return f"Here is the breakdown of your {command}:\n{result_str}"
+            elif isinstance(result, pd.DataFrame) and command == "recurring expenses":
+                if result.empty:
+                    return "I could not find any recurring payments."
+                result_str = "\n".join(
+                    f"{merchant}: {row['Cadence']}, about €{row['Average Amount (EUR)']:,.2f}; "
+                    f"next charge of €{row['Next Amount (EUR)']:,.2f} expected on {row['Next Date']:%Y-%m-%d}"
+                    for merchant, row in result.iterrows()
+                )
+                return f"Here are your recurring payments:\n{result_str}"
+            elif isinstance(result, pd.DataFrame):
+                return f"Here is your {command}:\n{result.to_string()}"
             elif isinstance(result, tuple):
                 return f"The {command} is '{result[0]}' with an amount of €{result[1]:,.2f}."
             else:
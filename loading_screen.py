@@ -1,13 +1,19 @@
 # loading_screen.py
 
-import streamlit as st
 import pandas as pd
-import time
-
-def process_data(file):
-    """Processes uploaded CSV data with a loading screen."""
-    with st.spinner("Processing data..."):
-        # Simulate data processing time; replace this with actual processing logic.
-        time.sleep(2)
-        data = pd.read_csv(file)
-        return data
+from schema import prepare_transactions
+
+# Rows read per CSV chunk when streaming an upload
+DEFAULT_CHUNKSIZE = 5000
+
+def iter_data(file, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Reads uploaded CSV data in chunks, parsing each chunk to the typed transaction layout.
+
+    Yields:
+    - tuple: (DataFrame chunk, fraction of the file read so far, or None if the size is unknown)
+    """
+    size = getattr(file, "size", None)
+    for chunk in pd.read_csv(file, chunksize=chunksize):
+        fraction = min(file.tell() / size, 1.0) if size and hasattr(file, "tell") else None
+        yield prepare_transactions(chunk), fraction
@@ -1,122 +1,131 @@
+import numpy as np
 import pandas as pd
 import streamlit as st
-import pandas as pd
-from charts import plot_top_categories, plot_monthly_growth, plot_yearly_summary
-# ... other imports if needed
-
+from aggregates import get_cube
+from budgets import get_budget_tracker
+from date_index import get_date_index
+from recurring import detect_recurring
+from result_cache import LRUCache, fingerprint, freeze, set_fingerprint
 from charts import (
-    plot_top_categories, plot_monthly_growth, plot_yearly_summary, category_bar_chart,
+    plot_top_categories, plot_monthly_growth, plot_yearly_summary, plot_budget_variance,
     time_series_line_chart, stacked_area_chart, pie_chart, bubble_chart, monthly_breakdown_chart,
-    cumulative_sum_line_chart, heatmap_transaction_frequency
+    cumulative_sum_line_chart, heatmap_transaction_frequency, TRANSACTION_CHARTS, cached_figure
 )
 
 def calculate_total_expenses(df):
     """Calculate total expenses from the categorized data."""
-    return df[df["Expense/Income"] == "Expense"]["Amount (EUR)"].sum()
+    return get_cube(df).total("Expense")
 
 def calculate_total_income(df):
     """Calculate total income from the categorized data."""
-    return df[df["Expense/Income"] == "Income"]["Amount (EUR)"].sum()
+    return get_cube(df).total("Income")
 
 def calculate_net_savings(df):
     """Calculate net savings (total income - total expenses)."""
-    total_income = calculate_total_income(df)
-    total_expenses = calculate_total_expenses(df)
-    return total_income - total_expenses
+    cube = get_cube(df)
+    return cube.total("Income") - cube.total("Expense")
 
 def calculate_category_spending(df, category):
     """Calculate total spending in a specified category."""
-    category_expense = df[(df["Category"] == category) & (df["Expense/Income"] == "Expense")]
-    return category_expense["Amount (EUR)"].sum()
+    return get_cube(df).total("Expense", category)
 
 def calculate_category_income(df, category):
     """Calculate total income in a specified category."""
-    category_income = df[(df["Category"] == category) & (df["Expense/Income"] == "Income")]
-    return category_income["Amount (EUR)"].sum()
+    return get_cube(df).total("Income", category)
 
 def calculate_average_spending(df):
     """Calculate average spending across all expenses."""
-    expenses = df[df["Expense/Income"] == "Expense"]
-    return expenses["Amount (EUR)"].mean()
+    return get_cube(df).mean("Expense")
+
+def transaction_at(df, position):
+    """Return the transaction at a row position; out-of-core sources read just that row."""
+    return df.iloc[position] if isinstance(df, pd.DataFrame) else df.transaction_at(position)
 
 def calculate_max_spending(df):
     """Identify the maximum expense transaction."""
-    expenses = df[df["Expense/Income"] == "Expense"]
-    max_spending = expenses.loc[expenses["Amount (EUR)"].idxmax()]
-    return max_spending["Name / Description"], max_spending["Amount (EUR)"]
+    row = transaction_at(df, get_cube(df).extreme("Expense", largest=True))
+    return row["Name / Description"], row["Amount (EUR)"]
 
 def calculate_min_spending(df):
     """Identify the minimum expense transaction."""
-    expenses = df[df["Expense/Income"] == "Expense"]
-    min_spending = expenses.loc[expenses["Amount (EUR)"].idxmin()]
-    return min_spending["Name / Description"], min_spending["Amount (EUR)"]
+    row = transaction_at(df, get_cube(df).extreme("Expense", largest=False))
+    return row["Name / Description"], row["Amount (EUR)"]
 
 def calculate_monthly_expenses(df):
     """Calculate total expenses per month."""
-    df['Month'] = pd.to_datetime(df['Date']).dt.to_period('M')
-    monthly_expenses = df[df["Expense/Income"] == "Expense"].groupby("Month")["Amount (EUR)"].sum()
-    return monthly_expenses
+    return get_cube(df).by("Month", "Expense")
 
 # Advanced metrics
 def top_categories_by_spending(df, n=3):
     """Return the top N categories by spending."""
-    expenses = df[df["Expense/Income"] == "Expense"]
-    return expenses.groupby("Category")["Amount (EUR)"].sum().nlargest(n)
+    return get_cube(df).by("Category", "Expense").nlargest(n)
 
 def top_categories_by_income(df, n=3):
     """Return the top N categories by income."""
-    income = df[df["Expense/Income"] == "Income"]
-    return income.groupby("Category")["Amount (EUR)"].sum().nlargest(n)
+    return get_cube(df).by("Category", "Income").nlargest(n)
 
 def monthly_growth_rate(df, type="Expense"):
     """Calculate the monthly growth rate for expenses or income."""
-    df['Month'] = pd.to_datetime(df['Date']).dt.to_period('M')
-    monthly_totals = df[df["Expense/Income"] == type].groupby("Month")["Amount (EUR)"].sum()
+    monthly_totals = get_cube(df).by("Month", type)
     growth_rate = monthly_totals.pct_change().fillna(0)
     return growth_rate
 
-def category_budget_variance(df, budget_dict):
+def category_budget_variance(df, budget_dict, month=None, rollover="none"):
     """
-    Compare actual spending against a budget for each category.
-    - budget_dict: Dictionary with category as key and budget as value.
+    Compare spending against the budget of each category for one month.
+    - budget_dict: Category to a monthly budget, or to {month: budget} (see `budgets.budget_matrix`).
+    - month: The month to compare (default the latest month in the data).
+    - rollover: One of `budgets.ROLLOVER_RULES`, or a dict of them per category.
+    Positive values are overspending.
     """
-    expenses = df[df["Expense/Income"] == "Expense"]
-    actuals = expenses.groupby("Category")["Amount (EUR)"].sum()
-    variance = actuals.subtract(pd.Series(budget_dict)).fillna(0)
-    return variance
+    return get_budget_tracker(df, budget_dict, rollover).variance(month)
+
+def budget_status(df, budget_dict, rollover="none"):
+    """Budget, carry-over, available amount, spending and utilization for every month and budgeted category."""
+    return get_budget_tracker(df, budget_dict, rollover).status()
 
 def savings_rate(df):
     """Calculate the savings rate as a percentage of total income."""
-    total_income = calculate_total_income(df)
-    total_expenses = calculate_total_expenses(df)
+    cube = get_cube(df)
+    total_income = cube.total("Income")
+    total_expenses = cube.total("Expense")
     return ((total_income - total_expenses) / total_income) * 100 if total_income > 0 else 0
 
 def income_to_expense_ratio(df):
     """Calculate the ratio of income to expenses."""
-    total_income = calculate_total_income(df)
-    total_expenses = calculate_total_expenses(df)
+    cube = get_cube(df)
+    total_income = cube.total("Income")
+    total_expenses = cube.total("Expense")
     return total_income / total_expenses if total_expenses > 0 else np.inf
 
 def spending_consistency(df):
     """Calculate the standard deviation of monthly spending as a measure of consistency."""
-    df['Month'] = pd.to_datetime(df['Date']).dt.to_period('M')
-    monthly_expenses = df[df["Expense/Income"] == "Expense"].groupby("Month")["Amount (EUR)"].sum()
-    return monthly_expenses.std()
+    return get_cube(df).by("Month", "Expense").std()
 
 def yearly_summary(df):
     """Return total income and expenses aggregated by year."""
-    df['Year'] = pd.to_datetime(df['Date']).dt.year
-    yearly_data = df.groupby(['Year', 'Expense/Income'])["Amount (EUR)"].sum().unstack(fill_value=0)
+    monthly = get_cube(df).by(["Month", "Expense/Income"])
+    yearly_data = (
+        monthly.groupby([monthly.index.get_level_values("Month").year.rename("Year"),
+                         monthly.index.get_level_values("Expense/Income")], observed=True)
+        .sum()
+        .unstack(fill_value=0)
+    )
+    yearly_data.columns = yearly_data.columns.astype(str)
     yearly_data['Net Savings'] = yearly_data.get('Income', 0) - yearly_data.get('Expense', 0)
     return yearly_data
 
 def recurring_expenses(df, threshold=3):
     """
-    Identify recurring expenses based on transaction descriptions appearing at least `threshold` times.
+    Identify recurring payments charged at least `threshold` times at a regular cadence.
+
+    This needs the individual charge dates, which the aggregate cube does not keep, so it reads
+    the rows (see `recurring.detect_recurring`).
     """
-    expenses = df[df["Expense/Income"] == "Expense"]
-    recurring = expenses["Name / Description"].value_counts()
-    return recurring[recurring >= threshold]
+    if not isinstance(df, pd.DataFrame):
+        # Out-of-core sources: read only the columns the detection needs
+        df = df.read(["Date", "Name / Description", "Expense/Income", "Amount (EUR)"])
+    return detect_recurring(df, min_occurrences=threshold)
 
 
 # Natural language command mappings
@@ -129,7 +138,8 @@ command_map = {
     "top spending categories": (top_categories_by_spending, plot_top_categories),
     "top income categories": (top_categories_by_income, plot_top_categories),
     "monthly growth rate": (monthly_growth_rate, plot_monthly_growth),
-    "budget variance": (category_budget_variance, category_bar_chart),
+    "budget variance": (category_budget_variance, plot_budget_variance),
+    "budget status": (budget_status, None),
     "savings rate": (savings_rate, None),
     "income to expense ratio": (income_to_expense_ratio, None),
     "spending consistency": (spending_consistency, None),
@@ -140,24 +150,90 @@ command_map = {
     "lowest transaction": (calculate_min_spending, None),
     "monthly breakdown": (calculate_monthly_expenses, monthly_breakdown_chart),
     "yearly breakdown": (yearly_summary, plot_yearly_summary),
-    "expense by category": (top_categories_by_spending, category_bar_chart),
-    "income by category": (top_categories_by_income, category_bar_chart),
+    "expense by category": (top_categories_by_spending, plot_top_categories),
+    "income by category": (top_categories_by_income, plot_top_categories),
     "savings goal progress": (None, cumulative_sum_line_chart)  # Placeholder for custom goal progress function
 }
 
+# Metric results shared by the dashboard and the chat, across reruns and sessions
+metric_cache = LRUCache()
+
+def filter_date_range(df, start_date, end_date):
+    """
+    Return the transactions dated from `start_date` through the whole of `end_date`.
+
+    The range resolves through the date index of `df` (two binary searches), and the result is a
+    zero-copy slice of its date-sorted rows. The slice is cached, so the same range yields the same
+    frame object on every rerun and the metrics memoized on it are reused. Its fingerprint combines
+    the source fingerprint with the range instead of hashing the rows again.
+    """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    key = (fingerprint(df), "date range", start, end)
+
+    def compute():
+        filtered = get_date_index(df).view(start, end + pd.Timedelta(days=1))
+        set_fingerprint(filtered, key)
+        return filtered
+
+    return metric_cache.get_or_compute(key, compute)
+
+def compute_metric(command, df, **kwargs):
+    """
+    Return the result of a metric command, memoized on the data fingerprint, command and kwargs.
+
+    Cached results are shared and must not be modified by the caller.
+    """
+    metric_func, _ = command_map.get(command, (None, None))
+    if metric_func is None:
+        return None
+    key = (fingerprint(df), command, freeze(kwargs))
+    return metric_cache.get_or_compute(key, lambda: metric_func(df, **kwargs))
+
+def evaluate(df, commands, params=None):
+    """
+    Evaluate several metric commands over the same data in one call.
+
+    The metrics are answered together from one aggregate cube and share its roll-ups (monthly,
+    per-category and per-type totals), so the rows are scanned once however many metrics are
+    asked for. Results already in the metric cache are reused, and new ones are added to it.
+
+    Parameters:
+    - df (DataFrame): Transaction data.
+    - commands (list): Names from `command_map`, e.g. ["total expenses", "savings rate"].
+    - params (dict): Optional keyword arguments per command, e.g. {"budget variance": {"budget_dict": {...}}}.
+
+    Returns:
+    - dict: Command name to result (None for unknown commands).
+    """
+    params = params or {}
+    if any(command_map.get(command, (None, None))[0] is not None for command in commands):
+        get_cube(df)  # Build the shared cube up front instead of inside the first metric
+    return {command: compute_metric(command, df, **params.get(command, {})) for command in commands}
+
+def cache_stats():
+    """Return the hit/miss counters of the metric cache."""
+    return metric_cache.stats()
+
 def execute_command(command, df, **kwargs):
-    """Execute the function associated with a command and return both metric result and plot function if available."""
+    """
+    Execute the function associated with a command and return both metric result and plot function if available.
+
+    The plot is rendered from the figure cache, keyed like the metric result, so asking again
+    does not rebuild it.
+    """
     metric_func, plot_func = command_map.get(command, (None, None))
     if metric_func is None:
         return None, None
-    result = metric_func(df, **kwargs)
+    result = compute_metric(command, df, **kwargs)
     
     # Display the result
     st.write(result)
     
     # Display the plot if a plot function is available
     if plot_func is not None:
-        fig = plot_func(result)
+        data = df if plot_func in TRANSACTION_CHARTS else result
+        key = (fingerprint(df), command, plot_func.__name__, freeze(kwargs))
+        fig = cached_figure(key, lambda: plot_func(data))
         st.plotly_chart(fig, use_container_width=True)
         
     return result, plot_func
@@ -1,13 +1,16 @@
 from langchain_community.llms import Ollama
 
-def initialize_llm(model_name="llama3.2"):
+def initialize_llm(model_name="llama3.2", base_url=None):
     """
     Initializes and returns the LLM instance with the specified model name.
     
     Parameters:
-    - model_name (str): The name of the model to use (default: "llama2").
+    - model_name (str): The name of the model to use (default: "llama3.2").
+    - base_url (str, optional): The Ollama server to use (default: the local server).
     
     Returns:
     - Ollama: An instance of the Ollama model.
     """
+    if base_url:
+        return Ollama(model=model_name, base_url=base_url)
     return Ollama(model=model_name)
@@ -0,0 +1,188 @@
+# parquet_store.py
+
+import argparse
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from aggregates import AggregateCube
+from schema import prepare_transactions
+
+PARTITION_COLUMN = "month"
+UNKNOWN_MONTH = "unknown"
+DEFAULT_CHUNKSIZE = 500_000
+
+# Columns kept in the store; 'Month' and 'Year' are derived again when reading
+STORE_SCHEMA = pa.schema([
+    ("Date", pa.timestamp("ns")),
+    ("Name / Description", pa.string()),
+    ("Expense/Income", pa.string()),
+    ("Amount (EUR)", pa.float64()),
+    ("Category", pa.string()),
+])
+
+# The columns the aggregate cube needs; descriptions are only read for the rows that need them
+CUBE_COLUMNS = ["Date", "Expense/Income", "Category", "Amount (EUR)"]
+
+
+def write_partitioned(source, root, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    Converts transactions to Parquet files partitioned by month (root/month=YYYY-MM/...).
+
+    The source is read and written chunk by chunk, so it never has to fit in memory. Rows without
+    a valid date go to the 'month=unknown' partition. Writing into an existing store adds files.
+
+    Parameters:
+    - source (str or DataFrame): A transaction CSV path or an in-memory frame.
+    - root (str): Directory of the store.
+    - chunksize (int): Rows per chunk read from a CSV.
+
+    Returns:
+    - int: Number of rows written.
+    """
+    chunks = pd.read_csv(source, chunksize=chunksize) if isinstance(source, str) else [source]
+    os.makedirs(root, exist_ok=True)
+    # Unique file names per call, so repeated conversions into the same store add rather than overwrite
+    run = hashlib.sha1(f"{source if isinstance(source, str) else id(source)}{pd.Timestamp.now().value}".encode()).hexdigest()[:8]
+    written = 0
+    for number, chunk in enumerate(chunks):
+        chunk = prepare_transactions(chunk)
+        frame = pd.DataFrame(index=chunk.index)
+        frame["Date"] = chunk["Date"] if "Date" in chunk.columns else pd.Series(pd.NaT, index=chunk.index, dtype="datetime64[ns]")
+        for column in ("Name / Description", "Expense/Income", "Category"):
+            frame[column] = chunk[column].astype("string") if column in chunk.columns else None
+        frame["Amount (EUR)"] = chunk["Amount (EUR)"]
+        table = pa.Table.from_pandas(frame, schema=STORE_SCHEMA, preserve_index=False)
+        months = frame["Date"].dt.strftime("%Y-%m").fillna(UNKNOWN_MONTH)
+        table = table.append_column(PARTITION_COLUMN, pa.array(months.to_numpy(dtype=object), type=pa.string()))
+        pq.write_to_dataset(
+            table, root, partition_cols=[PARTITION_COLUMN],
+            basename_template=f"part-{run}-{number:05d}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        written += len(frame)
+    return written
+
+
+class ParquetTransactions:
+    """
+    Month-partitioned Parquet store that the `metrics` functions accept in place of a DataFrame.
+
+    Metrics are answered from an aggregate cube built by scanning only the cube's columns, batch
+    by batch, from only the month partitions overlapping the selected date range; memory stays
+    bounded by one batch plus the cube. The few metrics that need individual rows (highest and
+    lowest transaction, recurring expenses) read just those rows or columns.
+    """
+
+    def __init__(self, root, start=None, end=None, batch_size=131_072):
+        self.root = root
+        self.start = None if start is None else pd.Timestamp(start)
+        self.end = None if end is None else pd.Timestamp(end)
+        self.batch_size = batch_size
+        self.dataset = ds.dataset(root, format="parquet", partitioning="hive")
+        self._fragments = None
+        self._cube = None
+
+    def between(self, start_date, end_date):
+        """The transactions dated from `start_date` through the whole of `end_date`, as a new store view."""
+        return ParquetTransactions(self.root, start_date, pd.Timestamp(end_date) + pd.Timedelta(days=1), self.batch_size)
+
+    def _partition_filter(self):
+        months = ds.field(PARTITION_COLUMN)
+        if self.start is None and self.end is None:
+            return None
+        condition = months != UNKNOWN_MONTH
+        if self.start is not None:
+            condition &= months >= self.start.strftime("%Y-%m")
+        if self.end is not None:
+            condition &= months <= (self.end - pd.Timedelta(microseconds=1)).strftime("%Y-%m")
+        return condition
+
+    def _row_filter(self):
+        condition = None
+        if self.start is not None:
+            condition = ds.field("Date") >= pa.scalar(self.start.as_unit("ns"), type=pa.timestamp("ns"))
+        if self.end is not None:
+            upper = ds.field("Date") < pa.scalar(self.end.as_unit("ns"), type=pa.timestamp("ns"))
+            condition = upper if condition is None else condition & upper
+        return condition
+
+    def fragments(self):
+        """The Parquet files of the selected months in a fixed order (by path, i.e. chronological)."""
+        if self._fragments is None:
+            self._fragments = sorted(self.dataset.get_fragments(filter=self._partition_filter()), key=lambda f: f.path)
+        return self._fragments
+
+    def fingerprint(self):
+        """Identifies the store contents and range, for the metric cache."""
+        digest = hashlib.sha1(repr((os.path.abspath(self.root), self.start, self.end)).encode("utf-8"))
+        for fragment in self.fragments():
+            stat = os.stat(fragment.path)
+            digest.update(f"{fragment.path}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+        return digest.hexdigest()
+
+    def batches(self, columns):
+        """
+        Yields (position of the first row, DataFrame) for every batch of the selected months.
+
+        Positions count every row of the selected files, so a row can be fetched again with
+        `transaction_at`; rows outside the date range are dropped from the yielded frames but keep
+        their positions.
+        """
+        position = 0
+        for fragment in self.fragments():
+            for batch in fragment.to_batches(columns=columns, batch_size=self.batch_size):
+                frame = batch.to_pandas()
+                frame.index = np.arange(position, position + len(frame))
+                if self.start is not None:
+                    frame = frame[frame["Date"] >= self.start]
+                if self.end is not None:
+                    frame = frame[frame["Date"] < self.end]
+                yield position, frame
+                position += batch.num_rows
+
+    def aggregate_cube(self):
+        """Builds (once) the aggregate cube of the selected transactions, one batch at a time."""
+        if self._cube is None:
+            cube = AggregateCube.from_frame(pd.DataFrame(columns=CUBE_COLUMNS))
+            for _, frame in self.batches(CUBE_COLUMNS):
+                cube = cube.merge(AggregateCube.from_frame(frame.reset_index(drop=True), positions=frame.index.to_numpy()))
+            self._cube = cube
+        return self._cube
+
+    def transaction_at(self, position):
+        """Reads the single row at `position` (as numbered by `batches`)."""
+        for fragment in self.fragments():
+            rows = fragment.count_rows()
+            if position < rows:
+                return fragment.take(pa.array([position]), columns=STORE_SCHEMA.names).to_pandas().iloc[0]
+            position -= rows
+        raise IndexError("Transaction position out of range")
+
+    def read(self, columns=None):
+        """Reads the selected transactions into memory (only `columns`, default all), typed like an upload."""
+        condition = None
+        for part in (self._partition_filter(), self._row_filter()):
+            if part is not None:
+                condition = part if condition is None else condition & part
+        table = self.dataset.to_table(columns=columns or STORE_SCHEMA.names, filter=condition)
+        return prepare_transactions(table.to_pandas())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a transaction CSV into a month-partitioned Parquet store.")
+    parser.add_argument("input", help="CSV file to convert")
+    parser.add_argument("root", help="Directory of the Parquet store")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows read per chunk")
+    args = parser.parse_args(argv)
+    written = write_partitioned(args.input, args.root, args.chunksize)
+    print(f"Wrote {written} rows to {args.root}.")
+
+
+if __name__ == "__main__":
+    main()
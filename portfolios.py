@@ -0,0 +1,186 @@
+# portfolios.py
+
+import argparse
+import gc
+import inspect
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import metrics
+from schema import prepare_transactions
+
+# Columns sent to the workers; the derived 'Month' and 'Year' are rebuilt there
+TRANSFER_COLUMNS = ["Date", "Name / Description", "Expense/Income", "Amount (EUR)", "Category"]
+
+
+def default_commands():
+    """Every command in `metrics.command_map` whose metric needs nothing but the data."""
+    commands = []
+    for command, (metric_func, _) in metrics.command_map.items():
+        if metric_func is None:
+            continue
+        required = [
+            parameter for parameter in list(inspect.signature(metric_func).parameters.values())[1:]
+            if parameter.default is inspect.Parameter.empty
+        ]
+        if not required:
+            commands.append(command)
+    return commands
+
+
+def share_frame(df):
+    """
+    Copies a frame into a shared memory block as an Arrow IPC stream.
+
+    Workers map the block and read the columns straight from it, so the frame is never pickled.
+
+    Returns:
+    - SharedMemory: The block; the caller closes and unlinks it once the workers are done.
+    """
+    columns = [column for column in TRANSFER_COLUMNS if column in df.columns]
+    frame = df[columns].copy()
+    for column in frame.columns:
+        if isinstance(frame[column].dtype, pd.CategoricalDtype):
+            frame[column] = frame[column].astype("string")
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    # Measure the stream first, then write it straight into the block
+    counter = pa.MockOutputStream()
+    with pa.ipc.new_stream(counter, table.schema) as writer:
+        writer.write_table(table)
+    block = shared_memory.SharedMemory(create=True, size=max(counter.size(), 1))
+    target = pa.py_buffer(block.buf)
+    with pa.ipc.new_stream(pa.FixedSizeBufferWriter(target), table.schema) as writer:
+        writer.write_table(table)
+    del target
+    return block
+
+
+def _load_source(source):
+    """Opens one account's data in a worker: a CSV path or a Parquet store directory."""
+    _, path = source
+    if os.path.isdir(path):
+        from parquet_store import ParquetTransactions  # Needs pyarrow datasets; only for stores
+        return ParquetTransactions(path)
+    return prepare_transactions(pd.read_csv(path))
+
+
+def evaluate_account(name, source, commands, params):
+    """
+    Evaluates the metrics of one account in a worker process.
+
+    Returns:
+    - tuple: (name, {command: result}), or (name, {"error": message}) if the account failed.
+    """
+    kind, value = source
+    block = None
+    try:
+        if kind == "shared":
+            block = shared_memory.SharedMemory(name=value)
+            # Arrow reads the columns in place from the mapped block
+            table = pa.ipc.open_stream(pa.py_buffer(block.buf)).read_all()
+            df = prepare_transactions(table.to_pandas())
+        else:
+            df = _load_source(source)
+        return name, metrics.evaluate(df, commands, params)
+    except Exception as e:
+        return name, {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        if block is not None:
+            # Drop every view into the block before unmapping it
+            table = df = None
+            gc.collect()
+            try:
+                block.close()
+            except BufferError:
+                pass  # A view is still alive; the mapping goes away with the worker process
+
+
+def evaluate_portfolios(accounts, commands=None, params=None, processes=None):
+    """
+    Evaluates metrics for many accounts in parallel across a process pool.
+
+    Files are opened by the workers themselves; in-memory frames are handed over through shared
+    memory as Arrow buffers rather than pickled. Each account is one task, so throughput grows with
+    the number of processes as long as there are more accounts than processes.
+
+    Parameters:
+    - accounts (dict or list): Account name to a CSV path, Parquet store directory or DataFrame;
+      a list of paths uses the paths as names.
+    - commands (list): Metric commands to evaluate (default: all with a metric function).
+    - params (dict): Keyword arguments per command, as for `metrics.evaluate`.
+    - processes (int): Worker processes (default: one per CPU).
+
+    Returns:
+    - dict: Account name to {command: result}, in the order of `accounts`.
+    """
+    if not isinstance(accounts, dict):
+        accounts = {str(path): path for path in accounts}
+    commands = commands or default_commands()
+    blocks = []
+    try:
+        sources = {}
+        for name, account in accounts.items():
+            if isinstance(account, pd.DataFrame):
+                blocks.append(share_frame(account))
+                sources[name] = ("shared", blocks[-1].name)
+            else:
+                sources[name] = ("path", os.fspath(account))
+        workers = max(1, min(processes or os.cpu_count() or 1, len(sources)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(evaluate_account, name, source, commands, params) for name, source in sources.items()]
+            results = dict(future.result() for future in futures)
+    finally:
+        for block in blocks:
+            block.close()
+            try:
+                block.unlink()
+            except FileNotFoundError:
+                pass  # Already removed by a worker's resource tracker (spawn start method)
+    return {name: results[name] for name in accounts}
+
+
+def summary_table(results):
+    """
+    One row per account with the metrics that have a single value (totals, rates, ...).
+
+    Metrics returning series or tables stay available in the `evaluate_portfolios` result.
+
+    Returns:
+    - DataFrame: Accounts as rows, scalar metrics as columns.
+    """
+    rows = {}
+    for name, values in results.items():
+        row = {}
+        for command, value in values.items():
+            if isinstance(value, tuple) and len(value) == 2:
+                # (description, amount) pairs such as the highest transaction
+                row[command] = value[0]
+                row[f"{command} (EUR)"] = value[1]
+            elif isinstance(value, (int, float, np.number, str)) and not isinstance(value, bool):
+                row[command] = value
+        rows[name] = row
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis("Account")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute metrics for many accounts in parallel.")
+    parser.add_argument("accounts", nargs="+", help="Transaction CSV files or Parquet store directories, one per account")
+    parser.add_argument("--commands", default=None, help="Comma-separated metric commands (default: all)")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--output", default=None, help="Write the per-account summary to this CSV file")
+    args = parser.parse_args(argv)
+
+    commands = [command.strip() for command in args.commands.split(",") if command.strip()] if args.commands else None
+    table = summary_table(evaluate_portfolios(args.accounts, commands, processes=args.processes))
+    print(table.to_string())
+    if args.output:
+        table.to_csv(args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# recurring.py
+
+import numpy as np
+import pandas as pd
+
+from canonicalize import get_merchant_codes
+from date_index import get_date_index
+from schema import parse_dates
+
+DAY_NS = 86_400 * 10**9
+
+# (name, lowest and highest typical interval in days, offset to the next charge)
+CADENCES = [
+    ("weekly", 5, 9, pd.DateOffset(weeks=1)),
+    ("biweekly", 12, 16, pd.DateOffset(weeks=2)),
+    ("monthly", 26, 35, pd.DateOffset(months=1)),
+    ("quarterly", 84, 98, pd.DateOffset(months=3)),
+    ("yearly", 350, 380, pd.DateOffset(years=1)),
+]
+
+RESULT_COLUMNS = [
+    "Cadence", "Occurrences", "Interval (days)", "Average Amount (EUR)", "Amount Variation",
+    "Last Date", "Next Date", "Next Amount (EUR)",
+]
+
+
+def detect_recurring(df, min_occurrences=3, interval_tolerance=0.2, amount_tolerance=0.25):
+    """
+    Finds recurring payments: merchants charged at a regular interval with a stable amount.
+
+    Expenses are grouped by canonical merchant key (so "SPOTIFY AB 1234" and "Spotify AB by
+    Adyen" count as one merchant). For every merchant the inter-arrival intervals and amounts are
+    summarized with vectorized group-bys over the date-sorted rows; a merchant is recurring when
+    its median interval matches a cadence, the intervals deviate from it by at most
+    `interval_tolerance` (median absolute deviation relative to the median), and the amounts vary
+    by at most `amount_tolerance` (coefficient of variation).
+
+    Parameters:
+    - df (DataFrame): Transaction data with 'Date', 'Name / Description', 'Expense/Income' and 'Amount (EUR)'.
+    - min_occurrences (int): Fewest charges a merchant needs to be considered.
+    - interval_tolerance (float): Allowed relative spread of the intervals.
+    - amount_tolerance (float): Allowed relative spread of the amounts.
+
+    Returns:
+    - DataFrame: One row per recurring merchant (indexed by its latest description) with the
+      cadence, number of charges, median interval, average amount and its variation, the last
+      charge date, and the predicted next charge date and amount, ordered by next charge date.
+    """
+    # The date index already holds the rows in date order, so a stable sort by merchant keeps each
+    # merchant's charges chronological
+    index = get_date_index(df)
+    rows = index.frame
+    dates = parse_dates(rows["Date"]).to_numpy(dtype="datetime64[ns]").view(np.int64)
+    amounts = pd.to_numeric(rows["Amount (EUR)"], errors="coerce").to_numpy(dtype=np.float64)
+    # Each distinct description is canonicalized once per dataset (and once more only when new ones are appended)
+    codes = get_merchant_codes(df)
+    raw_codes = codes.raw_codes[index.order]
+    keep = ((rows["Expense/Income"] == "Expense").to_numpy() & (dates != np.iinfo(np.int64).min)
+            & ~np.isnan(amounts) & (raw_codes >= 0))
+    raw_codes, dates, amounts = raw_codes[keep], dates[keep], amounts[keep]
+    merchants = codes.merchant_of_raw[raw_codes]
+    raw_names = codes.raw_names
+
+    # With more than half of its intervals shorter than the shortest cadence, a merchant's median
+    # interval cannot match one: c charges need at least (c - 1) / 2 * shortest days to span
+    span = (dates[-1] - dates[0]) / DAY_NS if len(dates) else 0.0
+    most = 2 * span / CADENCES[0][1] + 1
+    counts = np.bincount(merchants, minlength=len(codes.merchants))
+    candidate = counts[merchants] >= max(min_occurrences, 2)
+    candidate &= counts[merchants] <= most
+    order = np.flatnonzero(candidate)[np.argsort(merchants[candidate], kind="stable")]
+    if not len(order):
+        return pd.DataFrame(columns=RESULT_COLUMNS).rename_axis("Merchant")
+    merchants, dates, amounts, raw_codes = merchants[order], dates[order], amounts[order], raw_codes[order]
+
+    # Intervals between consecutive charges of the same merchant, in days
+    same = merchants[1:] == merchants[:-1]
+    intervals = pd.Series(np.diff(dates)[same] / DAY_NS)
+    interval_groups = merchants[1:][same]
+    median_interval = intervals.groupby(interval_groups).median()
+    spread = (intervals - median_interval.reindex(interval_groups).to_numpy()).abs().groupby(interval_groups).median()
+
+    # Each merchant's charges are contiguous, so sums reduce over segments without a hash group-by
+    first = np.flatnonzero(np.concatenate([[True], merchants[1:] != merchants[:-1]]))
+    last = np.append(first[1:], len(merchants)) - 1
+    occurrences = np.diff(np.append(first, len(merchants)))
+    mean = np.add.reduceat(amounts, first) / occurrences
+    variance = np.maximum(np.add.reduceat(amounts ** 2, first) / occurrences - mean ** 2, 0.0)
+    std = np.sqrt(variance * occurrences / np.maximum(occurrences - 1, 1))
+
+    summary = pd.DataFrame({
+        "Occurrences": occurrences,
+        "Interval (days)": median_interval.to_numpy(),
+        "spread": spread.to_numpy(),
+        "Average Amount (EUR)": mean,
+        "Amount Variation": std / np.abs(mean),
+        "Last Date": pd.to_datetime(dates[last]),
+        # The latest charge is the best guess for the next one (it reflects any price change)
+        "Next Amount (EUR)": amounts[last],
+    }, index=pd.Index(raw_names.take(raw_codes[last]), name="Merchant"))
+
+    summary["Cadence"] = None
+    for name, low, high, _ in CADENCES:
+        summary.loc[summary["Interval (days)"].between(low, high), "Cadence"] = name
+    recurring = summary[
+        summary["Cadence"].notna()
+        & (summary["spread"] <= interval_tolerance * summary["Interval (days)"])
+        & (summary["Amount Variation"] <= amount_tolerance)
+    ].copy()
+
+    recurring["Next Date"] = pd.NaT
+    for name, _, _, offset in CADENCES:
+        selected = recurring["Cadence"] == name
+        if selected.any():
+            recurring.loc[selected, "Next Date"] = recurring.loc[selected, "Last Date"] + offset
+    recurring["Next Date"] = pd.to_datetime(recurring["Next Date"])
+    return recurring[RESULT_COLUMNS].sort_values("Next Date")
@@ -0,0 +1,165 @@
+# result_cache.py
+
+import hashlib
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_MAX_BYTES = int(float(os.getenv("MOOSE_RESULT_CACHE_MB", "64")) * 1024 * 1024)
+
+# Values memoized per live frame object, keyed by id(); entries go away with their frame
+_frame_memos = {}
+
+
+def frame_memo(df, name, compute):
+    """
+    Returns `compute()` memoized on the frame object `df` under `name`.
+
+    The value lives as long as the frame does. Frames are treated as read-only (see
+    `schema.prepare_transactions`); a frame mutated in place needs `forget_frame` first.
+    """
+    key = id(df)
+    entry = _frame_memos.get(key)
+    if entry is None or entry[0]() is not df:
+        entry = (weakref.ref(df), {})
+        _frame_memos[key] = entry
+        weakref.finalize(df, _frame_memos.pop, key, None)
+    values = entry[1]
+    if name not in values:
+        values[name] = compute()
+    return values[name]
+
+
+def peek_frame(df, name):
+    """Returns the value memoized on `df` under `name`, or None if it was not computed yet."""
+    entry = _frame_memos.get(id(df))
+    if entry is None or entry[0]() is not df:
+        return None
+    return entry[1].get(name)
+
+
+def remember_frame(df, name, value):
+    """Memoizes an already computed `value` on `df` under `name`."""
+    frame_memo(df, name, lambda: value)
+
+
+def forget_frame(df):
+    """Drops everything memoized on `df`."""
+    _frame_memos.pop(id(df), None)
+
+
+def fingerprint(df):
+    """
+    Content fingerprint of a frame: its columns, dtypes and a hash of every row.
+
+    Hashing is vectorized and runs once per frame object; later calls are a dictionary lookup.
+    Frames derived through a memoized step can be given a cheaper fingerprint with `set_fingerprint`.
+    """
+    if not isinstance(df, (pd.DataFrame, pd.Series)):
+        return df.fingerprint()  # Out-of-core sources fingerprint their files
+    def compute():
+        digest = hashlib.sha1(repr([(str(column), str(dtype)) for column, dtype in df.dtypes.items()]).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+        return digest.hexdigest()
+    return frame_memo(df, "fingerprint", compute)
+
+
+def set_fingerprint(df, value):
+    """Assigns the fingerprint of a frame derived from another one, e.g. (parent fingerprint, filter)."""
+    frame_memo(df, "fingerprint", lambda: hashlib.sha1(repr(value).encode("utf-8")).hexdigest())
+
+
+def freeze(value):
+    """Turns kwargs, lists and dicts into a hashable cache key component."""
+    if isinstance(value, dict):
+        return tuple(sorted((str(key), freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, (pd.Series, pd.DataFrame)):
+        return fingerprint(value)
+    return value
+
+
+def estimate_size(value):
+    """Approximate memory held by a cached value (frames, figures, tuples, scalars) in bytes."""
+    if isinstance(value, (pd.Series, pd.DataFrame, pd.Index)):
+        usage = value.memory_usage(index=True)
+        return int(usage.sum()) if isinstance(usage, pd.Series) else int(usage)
+    if hasattr(value, "to_plotly_json"):
+        return len(value.to_json())  # Plotly figures: the size of what is sent to the browser
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache bounded by the estimated size of its values.
+
+    Shared by every Streamlit session in the process, so results survive reruns and are reused
+    between tabs. `hits` and `misses` count lookups so the hit rate can be checked.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, max_entries=1024):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = estimate_size(value)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self.entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes or len(self.entries) > self.max_entries:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.size -= evicted
+
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for `key`, computing and storing it on a miss."""
+        marker = object()
+        value = self.get(key, marker)
+        if value is marker:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """Hit/miss counters and current usage."""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.size,
+            }
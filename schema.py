@@ -0,0 +1,129 @@
+# schema.py
+
+import numpy as np
+import pandas as pd
+
+from utils import validate_columns
+
+SCHEMA_VERSION = 1
+
+REQUIRED_COLUMNS = ["Name / Description", "Amount (EUR)"]
+
+# Format of the exported statements; parsing with an explicit format avoids per-row format inference
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+TRANSACTION_TYPES = pd.CategoricalDtype(["Expense", "Income"])
+
+
+def parse_dates(values):
+    """
+    Parses a date column to datetime64, trying the fast fixed format first.
+
+    Values that do not match DATE_FORMAT (plain dates, other layouts) are parsed again with
+    format inference; anything still unparseable becomes NaT.
+
+    Parameters:
+    - values (Series): Raw date values.
+
+    Returns:
+    - Series: datetime64 values aligned with `values`.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    parsed = pd.to_datetime(values, format=DATE_FORMAT, errors="coerce")
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry].astype(str), format="mixed", errors="coerce")
+    return parsed
+
+
+def prepare_transactions(df):
+    """
+    Validates transaction data and converts it to the typed layout every other module consumes.
+
+    - 'Date' becomes datetime64, with 'Month' (monthly Period) and 'Year' derived from it once
+    - 'Expense/Income' and 'Category' become categoricals
+    - 'Amount (EUR)' becomes float64; sums carry binary rounding error (far below a cent for
+      realistic totals), so compare them with a tolerance and round for display
+
+    The input is not modified. Preparing an already prepared frame is cheap, so the step can be
+    re-applied after rows are appended. Treating the result as read-only is a convention, not
+    enforced: aggregates are memoized per frame (see result_cache), so code that needs other
+    values works on a copy or a new frame (as concat_prepared does) instead of writing in place.
+
+    Parameters:
+    - df (DataFrame): Raw transaction data.
+
+    Returns:
+    - DataFrame: The typed transaction data.
+    """
+    if not validate_columns(df, REQUIRED_COLUMNS):
+        raise ValueError(f"The uploaded file must contain the following columns: {REQUIRED_COLUMNS}")
+
+    columns = {}
+    columns["Amount (EUR)"] = pd.to_numeric(df["Amount (EUR)"], errors="coerce").astype(np.float64)
+    if "Date" in df.columns:
+        dates = parse_dates(df["Date"])
+        columns["Date"] = dates
+        columns["Month"] = dates.dt.to_period("M")
+        columns["Year"] = dates.dt.year.astype("Int16")
+    if "Expense/Income" in df.columns:
+        columns["Expense/Income"] = df["Expense/Income"].astype(TRANSACTION_TYPES)
+        unknown = columns["Expense/Income"].isna() & df["Expense/Income"].notna()
+        if unknown.any():
+            print(f"Warning: {unknown.sum()} rows have an 'Expense/Income' value other than Expense or Income.")
+    if "Category" in df.columns and not isinstance(df["Category"].dtype, pd.CategoricalDtype):
+        columns["Category"] = df["Category"].astype("category")
+
+    prepared = df.assign(**columns)
+    prepared.attrs["schema"] = SCHEMA_VERSION
+    return prepared
+
+
+def concat_prepared(df, new_rows):
+    """
+    Appends rows to a prepared frame, keeping its typed layout.
+
+    Only `new_rows` are prepared. Categories the new rows introduce are added to the existing
+    categoricals (their integer codes stay as they are), so `pd.concat` keeps every column typed
+    instead of falling back to object and having to convert all rows back.
+
+    Parameters:
+    - df (DataFrame): Prepared transaction data.
+    - new_rows (DataFrame): Raw or prepared rows to append; columns not in `df` are dropped.
+
+    Returns:
+    - DataFrame: The prepared rows of `df` followed by those of `new_rows`, with a fresh index.
+    """
+    new_rows = prepare_transactions(new_rows)
+    new_rows = new_rows[[column for column in new_rows.columns if column in df.columns]]
+    old_columns, new_columns = {}, {}
+    for column in new_rows.columns:
+        if not isinstance(df[column].dtype, pd.CategoricalDtype) or df[column].dtype == new_rows[column].dtype:
+            continue
+        values = new_rows[column].astype(object)
+        extra = pd.Index(values.dropna().unique()).difference(df[column].cat.categories)
+        old_columns[column] = df[column].cat.add_categories(extra) if len(extra) else df[column]
+        new_columns[column] = pd.Categorical(values, dtype=old_columns[column].dtype)
+    combined = pd.concat([df.assign(**old_columns), new_rows.assign(**new_columns)], ignore_index=True)
+    combined.attrs["schema"] = SCHEMA_VERSION
+    return combined
+
+
+def is_prepared(df):
+    """Returns True if `df` came out of `prepare_transactions`."""
+    return df.attrs.get("schema") == SCHEMA_VERSION
+
+
+def months(df):
+    """The monthly Period of each transaction, using the precomputed column when available."""
+    if "Month" in df.columns and isinstance(df["Month"].dtype, pd.PeriodDtype):
+        return df["Month"]
+    return parse_dates(df["Date"]).dt.to_period("M").rename("Month")
+
+
+def years(df):
+    """The year of each transaction, using the precomputed column when available."""
+    if "Year" in df.columns and is_prepared(df):
+        return df["Year"]
+    return parse_dates(df["Date"]).dt.year.rename("Year")
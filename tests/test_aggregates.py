@@ -0,0 +1,91 @@
+# tests/test_aggregates.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import extend_aggregates, get_cube, get_running_balance, verify_aggregates
+from canonicalize import get_merchant_codes
+from date_index import DateIndex, get_date_index
+from result_cache import peek_frame, remember_frame
+from schema import concat_prepared, prepare_transactions
+
+
+NAMES = ("shop", "landlord", "employer", "CAFE REF 12345", "Cafe")
+
+
+def make_transactions(rows, seed, start="2023-01-01", days=365, categories=("Groceries", "Rent", "Salary"), names=NAMES):
+    """Random transactions with some missing dates, amounts, descriptions and categories."""
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, rows), unit="D")
+    df = pd.DataFrame({
+        "Date": dates.strftime("%Y-%m-%d").to_numpy(dtype=object),
+        "Name / Description": rng.choice(list(names), rows).astype(object),
+        "Expense/Income": rng.choice(["Expense", "Income"], rows),
+        "Amount (EUR)": rng.integers(1, 50_000, rows) / 100,
+        "Category": rng.choice(list(categories), rows).astype(object),
+    })
+    df.loc[rng.random(rows) < 0.05, "Date"] = None
+    df.loc[rng.random(rows) < 0.05, "Amount (EUR)"] = np.nan
+    df.loc[rng.random(rows) < 0.05, "Category"] = None
+    df.loc[rng.random(rows) < 0.02, "Name / Description"] = None
+    return df
+
+
+def build_all(df):
+    get_cube(df)
+    get_running_balance(df)
+    get_date_index(df)
+    get_merchant_codes(df)
+
+
+@pytest.mark.parametrize("start, categories, names", [
+    ("2024-01-01", ("Groceries", "Rent"), NAMES),  # After the current end, known categories and descriptions
+    ("2023-06-01", ("Groceries", "Travel"), ("shop", "Cafe REF 999", "Airline")),  # Backdated, with new ones
+    ("2022-01-01", ("Gifts",), ("Gift shop #12",)),  # Before the first transaction
+])
+def test_incremental_append_matches_rebuild(start, categories, names):
+    df = prepare_transactions(make_transactions(2_000, seed=1))
+    build_all(df)
+    for step in range(3):
+        new_rows = make_transactions(25, seed=10 + step, start=start, days=60, categories=categories, names=names)
+        combined = concat_prepared(df, new_rows)
+        extend_aggregates(df, combined)
+        assert verify_aggregates(combined) == []
+        df = combined
+
+
+def test_concat_prepared_matches_preparing_everything():
+    df = prepare_transactions(make_transactions(500, seed=2))
+    new_rows = make_transactions(20, seed=3, categories=("Travel", "Rent"))
+    new_rows.loc[:4, "Category"] = None
+    combined = concat_prepared(df, new_rows)
+    rebuilt = prepare_transactions(pd.concat([df, new_rows], ignore_index=True))
+    assert combined.dtypes.equals(rebuilt.dtypes)
+    pd.testing.assert_frame_equal(combined.astype(object), rebuilt.astype(object))
+
+
+def test_extended_date_index_answers_like_a_rebuild():
+    df = prepare_transactions(make_transactions(1_000, seed=4))
+    get_date_index(df)
+    combined = concat_prepared(df, make_transactions(40, seed=5, start="2023-03-01", days=30, categories=("Travel",)))
+    extend_aggregates(df, combined)
+    extended, rebuilt = get_date_index(combined), DateIndex(combined)
+    pd.testing.assert_frame_equal(extended.frame, rebuilt.frame)
+    start, end = pd.Timestamp("2023-02-15"), pd.Timestamp("2023-04-01")
+    # Groups added by an append carry plain labels rather than categoricals
+    pd.testing.assert_frame_equal(
+        extended.totals(start, end).sort_index(), rebuilt.totals(start, end).sort_index(),
+        check_index_type=False, check_categorical=False,
+    )
+
+
+def test_verify_aggregates_reports_stale_aggregates():
+    df = prepare_transactions(make_transactions(300, seed=6))
+    build_all(df)
+    combined = concat_prepared(df, make_transactions(10, seed=7))
+    # Carrying the old aggregates over without the new rows must be caught
+    stale = ["cube", "date_index", "merchant_codes", "running_balance"]
+    for name in stale:
+        remember_frame(combined, name, peek_frame(df, name))
+    assert sorted(verify_aggregates(combined)) == stale
@@ -0,0 +1,42 @@
+# tests/test_batch_categorize.py
+
+import pandas as pd
+
+import batch_categorize
+import categorization
+from category_cache import CategoryCache
+
+
+class FakeLLM:
+    """Answers every categorization prompt with 'Travel' for each transaction."""
+
+    model = "fake"
+
+    def invoke(self, prompt):
+        names = prompt.split("(one per line):\n", 1)[1].split("\n")
+        return "\n".join(f"{i + 1}. {name} - Travel" for i, name in enumerate(names))
+
+
+def test_recategorizing_a_categorized_file_replaces_its_categories(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_categorize, "initialize_llm", lambda model, base_url=None: FakeLLM())
+    monkeypatch.setattr(categorization, "category_cache", CategoryCache(str(tmp_path / "cache.sqlite")))
+    # A categorized file saved with its index, as categorized_transactions.csv is
+    pd.DataFrame({
+        "Date": ["2024-01-01 10:00:00.000000", "2024-01-02 11:30:00.000000", "2024-01-03 09:15:00.000000"],
+        "Name / Description": ["Airline", "Taxi REF 12345", "Airline"],
+        "Expense/Income": ["Expense", "Expense", "Expense"],
+        "Amount (EUR)": [120.5, 30.0, 99.99],
+        "Transaction": ["Airline", "Taxi REF 12345", "Airline"],
+        "Category": ["Miscellaneous", "Transportation", "Miscellaneous"],
+    }).to_csv(tmp_path / "categorized.csv")
+
+    output = tmp_path / "recategorized.csv"
+    batch_categorize.main([
+        str(tmp_path / "categorized.csv"), str(output), "--checkpoint-dir", str(tmp_path / "checkpoints"),
+        "--categories", "Travel,Miscellaneous", "--processes", "1",
+    ])
+
+    result = pd.read_csv(output)
+    assert result.columns.tolist() == ["Date", "Name / Description", "Expense/Income", "Amount (EUR)", "Category"]
+    assert result["Category"].tolist() == ["Travel", "Travel", "Travel"]
+    assert result["Date"].tolist()[0] == "2024-01-01 10:00:00.000000"
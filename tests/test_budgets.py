@@ -0,0 +1,55 @@
+# tests/test_budgets.py
+
+import pandas as pd
+import streamlit as st
+
+import budgets
+from budgets import BudgetTracker, appended_alerts, extend_budget_trackers, get_budget_tracker
+from schema import concat_prepared, prepare_transactions
+
+BUDGETS = {"Groceries": 300.0, "Rent": {"default": 1000.0, "2024-02": 1100.0}}
+
+
+def make_transactions(rows):
+    """(date, category, amount) expenses as prepared transactions."""
+    return prepare_transactions(pd.DataFrame({
+        "Date": [date for date, _, _ in rows],
+        "Name / Description": [category.lower() for _, category, _ in rows],
+        "Expense/Income": "Expense",
+        "Amount (EUR)": [amount for _, _, amount in rows],
+        "Category": [category for _, category, _ in rows],
+    }))
+
+
+def test_appended_trackers_match_a_rebuild_and_report_alerts():
+    df = make_transactions([
+        ("2024-01-05", "Groceries", 120.0), ("2024-01-01", "Rent", 1000.0),
+        ("2024-02-03", "Groceries", 200.0), ("2024-02-01", "Rent", 1100.0),
+    ])
+    tracker = get_budget_tracker(df, BUDGETS, "full")
+    before = tracker.status()
+    new_rows = make_transactions([("2024-02-20", "Groceries", 70.0), ("2024-01-20", "Groceries", 150.0)])
+    combined = concat_prepared(df, new_rows)
+    extend_budget_trackers(df, combined, budgets={})
+
+    carried = get_budget_tracker(combined, BUDGETS, "full")
+    assert carried is not tracker
+    pd.testing.assert_frame_equal(carried.status(), BudgetTracker.from_transactions(combined, BUDGETS, "full").status())
+    # The tracker of the old frame is left as it was
+    pd.testing.assert_frame_equal(tracker.status(), before)
+
+    alerts = appended_alerts(combined)
+    # January groceries reach 90% (270 of 300), February's 82% (270 of 300 plus the 30 carried over)
+    assert set(zip(alerts["Month"].astype(str), alerts["Category"], alerts["Threshold"])) == {
+        ("2024-01", "Groceries", 0.8), ("2024-02", "Groceries", 0.8),
+    }
+
+
+def test_saved_budgets_are_tracked_on_append(monkeypatch):
+    monkeypatch.setitem(st.session_state, "saved_budgets", {})
+    budgets.set_budget("Groceries", 100.0)
+    df = make_transactions([("2024-03-01", "Groceries", 50.0)])
+    combined = concat_prepared(df, make_transactions([("2024-03-02", "Groceries", 60.0)]))
+    extend_budget_trackers(df, combined)
+    assert appended_alerts(combined)["Threshold"].tolist() == [1.0]
+    assert budgets.current_alerts(combined)["Threshold"].tolist() == [1.0]
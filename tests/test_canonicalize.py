@@ -0,0 +1,22 @@
+# tests/test_canonicalize.py
+
+import pandas as pd
+import pytest
+
+from canonicalize import canonicalize
+
+
+@pytest.mark.parametrize("description, key", [
+    ("SPOTIFY AB 12345", "spotify ab"),
+    ("Spotify AB by Adyen", "spotify ab"),
+    ("CAFE REF 12345", "cafe"),
+    ("Cafe ref: A12B", "cafe"),
+    ("Rent 2024-01-31", "rent"),
+    ("Rent 2024-01", "rent"),
+    ("Rent 01/2024", "rent"),
+    # Labels followed by words rather than reference numbers are kept
+    ("ID Card Renewal", "id card renewal"),
+    ("AUTH Payment Salary", "auth payment salary"),
+])
+def test_canonicalize(description, key):
+    assert canonicalize(pd.Series([description])).tolist() == [key]
@@ -0,0 +1,34 @@
+# tests/test_categorization.py
+
+import pandas as pd
+import pytest
+
+import categorization
+from categorization import LLMUnavailableError, categorize_batch
+
+
+def replies(monkeypatch, *outcomes):
+    """Makes successive LLM calls return the given frames or raise the given exceptions."""
+    outcomes = list(outcomes)
+
+    def categorize_transactions(transaction_names, llm, categories=None):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(categorization, "categorize_transactions", categorize_transactions)
+
+
+def test_unparsable_reply_then_transport_errors_is_left_to_the_caller(monkeypatch):
+    replies(monkeypatch, pd.DataFrame(columns=["Transaction", "Category"]),
+            ConnectionError("refused"), ConnectionError("refused"))
+    categories_df, _, attempts = categorize_batch(["Airline"], ["Travel"], retries=2, backoff=0)
+    assert categories_df is None
+    assert attempts == 3
+
+
+def test_only_transport_errors_raise(monkeypatch):
+    replies(monkeypatch, ConnectionError("refused"), ConnectionError("refused"))
+    with pytest.raises(LLMUnavailableError):
+        categorize_batch(["Airline"], ["Travel"], retries=1, backoff=0)
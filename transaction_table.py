@@ -0,0 +1,136 @@
+# transaction_table.py
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from result_cache import LRUCache, fingerprint, frame_memo
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+SORT_COLUMNS = ["Date", "Amount (EUR)", "Name / Description", "Category", "Expense/Income"]
+
+# Row orders of filtered and sorted tables, so paging through them only slices
+query_cache = LRUCache(max_entries=256)
+
+
+def sort_order(df, column):
+    """
+    Positions of the rows of `df` in ascending order of `column` (missing values last), memoized
+    on the frame.
+
+    Frames from the date index are already in date order, so sorting by date is free for them.
+    """
+    def compute():
+        values = df[column]
+        if column == "Date" and values.is_monotonic_increasing:
+            return np.arange(len(df))
+        if isinstance(values.dtype, pd.CategoricalDtype) or values.dtype == object or pd.api.types.is_string_dtype(values):
+            # Sort the distinct values once and order the rows by their rank
+            codes, uniques = pd.factorize(values.astype(object), sort=True)
+            codes = np.where(codes < 0, len(uniques), codes)
+            return np.argsort(codes, kind="stable")
+        keys = values.to_numpy(dtype="datetime64[ns]" if column == "Date" else np.float64)
+        return np.argsort(keys, kind="stable")  # NaN and NaT sort last
+    return frame_memo(df, f"sort order {column}", compute)
+
+
+def search_mask(df, text):
+    """
+    Rows whose description contains `text` (case-insensitive).
+
+    The match runs once per distinct description and is mapped back to the rows through the
+    description codes, which are memoized on the frame.
+    """
+    codes, uniques = frame_memo(
+        df, "description codes", lambda: pd.factorize(df["Name / Description"].astype(object))
+    )
+    matches = pd.Series(uniques, dtype=object).str.contains(text, case=False, regex=False, na=False).to_numpy()
+    return np.where(codes >= 0, matches[codes], False)
+
+
+def query_transactions(df, search="", types=None, categories=None, sort_by="Date", descending=True):
+    """
+    Filters, searches and sorts the transactions without copying them.
+
+    Results are cached by data fingerprint and query, so moving between pages of the same query
+    costs a slice.
+
+    Parameters:
+    - df (DataFrame): Transaction data (e.g. the date-filtered view).
+    - search (str): Text the description must contain.
+    - types (list): 'Expense'/'Income' values to keep (default all).
+    - categories (list): Categories to keep (default all).
+    - sort_by (str): Column to sort on.
+    - descending (bool): Largest (or latest) first; missing values stay last.
+
+    Returns:
+    - ndarray: Row positions of the matching transactions in display order.
+    """
+    key = (fingerprint(df), "table", search, tuple(types or ()), tuple(categories or ()), sort_by, descending)
+
+    def compute():
+        mask = np.ones(len(df), dtype=bool)
+        if search:
+            mask &= search_mask(df, search)
+        if types:
+            mask &= df["Expense/Income"].isin(types).to_numpy()
+        if categories:
+            mask &= df["Category"].isin(categories).to_numpy()
+        order = sort_order(df, sort_by)
+        if descending:
+            present = df[sort_by].notna().to_numpy()[order]
+            order = np.concatenate([order[present][::-1], order[~present]])
+        return order[mask[order]]
+
+    return query_cache.get_or_compute(key, compute)
+
+
+def get_page(df, positions, page, page_size):
+    """The rows of one page (1-based) of a query result; only these rows are materialized."""
+    start = (page - 1) * page_size
+    return df.iloc[positions[start:start + page_size]]
+
+
+@st.fragment
+def render_transaction_table(df):
+    """
+    Paginated transaction table with search, filters and sorting done on the server.
+
+    Only the rows of the visible page are sent to the browser, and as a fragment, paging or
+    changing the query reruns just this table instead of the whole tab.
+    """
+    col1, col2, col3 = st.columns([2, 1, 1])
+    search = col1.text_input("Search descriptions", key="table_search")
+    types = col2.multiselect("Type", ["Expense", "Income"], key="table_types")
+    category_options = sorted(df["Category"].dropna().unique().tolist()) if "Category" in df.columns else []
+    categories = col3.multiselect("Category", category_options, key="table_categories")
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    sort_columns = [column for column in SORT_COLUMNS if column in df.columns]
+    sort_by = col1.selectbox("Sort by", sort_columns, key="table_sort")
+    descending = col2.toggle("Descending", value=True, key="table_descending")
+    page_size = col3.selectbox("Rows per page", PAGE_SIZES, index=1, key="table_page_size")
+
+    positions = query_transactions(df, search.strip(), types, categories, sort_by, descending)
+    pages = max(1, -(-len(positions) // page_size))
+
+    # A new query starts again from the first page
+    query = (fingerprint(df), search, tuple(types), tuple(categories), sort_by, descending, page_size)
+    if st.session_state.get("table_query") != query:
+        st.session_state["table_query"] = query
+        st.session_state["table_page"] = 1
+    page = min(st.session_state.get("table_page", 1), pages)
+
+    st.dataframe(get_page(df, positions, page, page_size), use_container_width=True)
+
+    # Widgets inside a fragment rerun only the fragment; the callbacks move the page before it runs
+    col1, col2, col3 = st.columns([1, 2, 1])
+    col1.button("Previous", disabled=page <= 1, key="table_previous", on_click=_turn_page, args=(page - 1,))
+    first = (page - 1) * page_size + 1 if len(positions) else 0
+    col2.caption(f"Rows {first:,}–{min(page * page_size, len(positions)):,} of {len(positions):,} · Page {page} of {pages}")
+    col3.button("Next", disabled=page >= pages, key="table_next", on_click=_turn_page, args=(page + 1,))
+
+
+def _turn_page(page):
+    st.session_state["table_page"] = page